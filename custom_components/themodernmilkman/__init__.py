@@ -6,45 +6,202 @@ import asyncio
 
 from homeassistant.config_entries import ConfigEntry, ConfigEntryState
 from homeassistant.const import Platform
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import device_registry as dr, entity_registry as er
 import homeassistant.helpers.config_validation as cv
 from homeassistant.helpers.typing import ConfigType
 
-from .const import DOMAIN
+from .api import TMMApiClient
+from .const import (
+    CONF_CALENDAR_SYNC_TASK,
+    CONF_CLIENT,
+    CONF_COORDINATOR,
+    CONF_PASSWORD,
+    CONF_SYNCED_CALENDARS,
+    CONF_USERNAME,
+    DOMAIN,
+)
+from .coordinator import TMMCoordinator
+from .handoff import async_pop_handoff
+from .options import TMMOptions, entry_calendars
+from .pool import async_get_pool
+from .sensor import LATENCY_SENSORS
+from .services import async_setup_services
+from .stats import TMMWastageStatistics
+from .store import TMMDeliveryHistory, TMMExportIndex, TMMSnapshotStore
 
 PLATFORMS = [Platform.CALENDAR, Platform.SENSOR]
+# Unique id suffixes of the sensors, for migrating them off the title.
+SENSOR_KEYS = (
+    "next_delivery",
+    "wastage",
+    *(f"{metric}_latency" for metric in LATENCY_SENSORS),
+)
 CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up platform from a ConfigEntry."""
     hass.data.setdefault(DOMAIN, {})
+
+    # Exported calendar events are tracked in their own store now.
+    if "uids" in entry.data:
+        data = dict(entry.data)
+        data.pop("uids")
+        hass.config_entries.async_update_entry(entry, data=data)
+
     hass_data = dict(entry.data)
 
+    _async_migrate_registry(hass, entry)
+
+    # A single coordinator is shared by every platform of this entry, and all
+    # entries share one HTTP pool.
+    pool = async_get_pool(hass)
+    stagger = pool.register(entry.entry_id)
+    client = TMMApiClient(hass, entry.data, pool.session, pool.login_semaphore)
+    snapshot = TMMSnapshotStore(hass, entry.entry_id)
+    history = TMMDeliveryHistory(hass, entry.entry_id)
+    await history.async_load()
+    coordinator = TMMCoordinator(
+        hass, client, snapshot, history, TMMOptions.from_options(entry.options)
+    )
+
+    # Pick up the session from the config flow that just ran.
+    if handoff := async_pop_handoff(hass, entry.unique_id):
+        client.auth.restore_state(handoff.session)
+
+    # Start from the last good snapshot and refresh off the boot path.
+    if await coordinator.async_restore_snapshot():
+        entry.async_create_background_task(
+            hass,
+            _async_staggered_refresh(coordinator, stagger),
+            f"{DOMAIN}_refresh_{entry.entry_id}",
+        )
+    else:
+        # Without a snapshot there is nothing to show until this refresh, and
+        # waiting out the stagger here would hold up Home Assistant's startup
+        # by a slot per account. Cold setups refresh straight away, their
+        # logins are still capped by the pool's login semaphore.
+        try:
+            await coordinator.async_config_entry_first_refresh()
+        except Exception:
+            await pool.async_unregister(entry.entry_id)
+            raise
+    hass_data[CONF_CLIENT] = client
+    hass_data[CONF_COORDINATOR] = coordinator
+
+    # Wastage totals go to long-term statistics rather than state attributes.
+    statistics = TMMWastageStatistics(hass, entry)
+    statistics.async_import(coordinator.data.wastage)
+    entry.async_on_unload(
+        coordinator.async_add_listener(
+            lambda: statistics.async_import(coordinator.data.wastage)
+        )
+    )
+
     # Registers update listener to update config entry when options are updated.
     unsub_options_update_listener = entry.add_update_listener(options_update_listener)
     # Store a reference to the unsubscribe function to cleanup if an entry is unloaded.
     hass_data["unsub_options_update_listener"] = unsub_options_update_listener
+
     hass.data[DOMAIN][entry.entry_id] = hass_data
     # Forward the setup to each platform.
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
     return True
 
 
+async def _async_staggered_refresh(coordinator: TMMCoordinator, delay: float) -> None:
+    """Refresh after a delay so accounts don't all hit the API at once."""
+    if delay:
+        await asyncio.sleep(delay)
+    await coordinator.async_refresh()
+
+
+@callback
+def _async_migrate_registry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Move the device and entities onto ids keyed by config entry.
+
+    The device used a fixed id and the entities the account holder's name,
+    so two accounts, or two of one person's accounts, collided.
+    """
+    device_registry = dr.async_get(hass)
+    if device := device_registry.async_get_device(identifiers={(DOMAIN, DOMAIN)}):
+        if entry.entry_id in device.config_entries:
+            device_registry.async_update_device(
+                device.id, new_identifiers={(DOMAIN, entry.entry_id)}
+            )
+
+    entity_registry = er.async_get(hass)
+    entity_id = entity_registry.async_get_entity_id(
+        Platform.CALENDAR, DOMAIN, f"{DOMAIN}-calendar"
+    )
+    if entity_id and entity_registry.async_get(entity_id).config_entry_id == (
+        entry.entry_id
+    ):
+        entity_registry.async_update_entity(
+            entity_id, new_unique_id=f"{DOMAIN}-{entry.entry_id}-calendar".lower()
+        )
+
+    prefix = f"{DOMAIN}-{entry.entry_id}-".lower()
+    for entity in er.async_entries_for_config_entry(entity_registry, entry.entry_id):
+        if entity.domain != Platform.SENSOR or entity.unique_id.startswith(prefix):
+            continue
+        if suffix := next(
+            (key for key in SENSOR_KEYS if entity.unique_id.endswith(f"-{key}")), None
+        ):
+            entity_registry.async_update_entity(
+                entity.entity_id, new_unique_id=f"{prefix}{suffix}"
+            )
+
+
 async def options_update_listener(hass: HomeAssistant, config_entry: ConfigEntry):
-    """Handle options update."""
+    """Handle options update.
+
+    Changes are applied to the running entry; only new credentials, which
+    need a new login, reload it.
+    """
     entry_state = hass.config_entries.async_get_entry(config_entry.entry_id).state
 
     # Proceed only if the entry is in a valid state (loaded, etc.)
-    if entry_state not in (
-        ConfigEntryState.SETUP_IN_PROGRESS,
-        ConfigEntryState.SETUP_RETRY,
-    ):
+    if entry_state is not ConfigEntryState.LOADED:
+        return
+
+    hass_data = hass.data[DOMAIN][config_entry.entry_id]
+    client: TMMApiClient = hass_data[CONF_CLIENT]
+    coordinator: TMMCoordinator = hass_data[CONF_COORDINATOR]
+
+    credentials = {
+        CONF_USERNAME: config_entry.data[CONF_USERNAME],
+        CONF_PASSWORD: config_entry.data[CONF_PASSWORD],
+    }
+    if credentials != client.auth.body:
         await hass.config_entries.async_reload(config_entry.entry_id)
+        return
+
+    await coordinator.async_apply_options(
+        TMMOptions.from_options(config_entry.options)
+    )
+
+    # Set the calendar platform up again to export to the new selection.
+    if entry_calendars(config_entry) != hass_data.get(CONF_SYNCED_CALENDARS):
+        if task := hass_data.pop(CONF_CALENDAR_SYNC_TASK, None):
+            task.cancel()
+        # Forwarding a setup outside entry setup needs the entry's setup lock.
+        async with config_entry.setup_lock:
+            await hass.config_entries.async_unload_platforms(
+                config_entry, [Platform.CALENDAR]
+            )
+            await hass.config_entries.async_forward_entry_setups(
+                config_entry, [Platform.CALENDAR]
+            )
 
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
+    # Stop any calendar export still running for this entry.
+    if task := hass.data[DOMAIN][entry.entry_id].get(CONF_CALENDAR_SYNC_TASK):
+        task.cancel()
+
     unload_ok = all(
         await asyncio.gather(
             *[
@@ -58,11 +215,20 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     # Remove config entry from domain.
     if unload_ok:
         hass.data[DOMAIN].pop(entry.entry_id)
+        await async_get_pool(hass).async_unregister(entry.entry_id)
 
     return unload_ok
 
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove persisted data when a config entry is deleted."""
+    await TMMSnapshotStore(hass, entry.entry_id).async_remove()
+    await TMMExportIndex(hass, entry.entry_id).async_remove()
+    await TMMDeliveryHistory(hass, entry.entry_id).async_remove()
+
+
 async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     """Set up the Modern Milkman component from yaml configuration."""
     hass.data.setdefault(DOMAIN, {})
+    async_setup_services(hass)
     return True
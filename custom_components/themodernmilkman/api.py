@@ -0,0 +1,180 @@
+"""The Modern Milkman API client."""
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+import hashlib
+from typing import Any
+
+from aiohttp import (
+    ClientError,
+    ClientSession,
+    ClientTimeout,
+    DummyCookieJar,
+    TCPConnector,
+)
+
+from homeassistant.core import HomeAssistant
+from homeassistant.util.json import json_loads
+from homeassistant.util.ssl import client_context
+
+from .const import (
+    API_CONNECTION_LIMIT,
+    API_KEEPALIVE_TIMEOUT,
+    API_REQUEST_HEADERS,
+    API_REQUEST_TIMEOUT,
+    CONF_NEXT_DELIVERY,
+    METRIC_USER_STATE,
+    NO_DELIVERY_STATUSES,
+    TMM_DATA_ENDPOINTS,
+    TMM_USER_STATE_URL,
+)
+from .exceptions import APIConnectionError, TMMError
+from .metrics import TMMMetrics
+from .ratelimit import async_get_limiter
+from .session import TMMSessionManager, handle_status_code
+
+
+def create_session(hass: HomeAssistant) -> ClientSession:
+    """Create a pooled, keep-alive HTTP session for the API."""
+    connector = TCPConnector(
+        limit=API_CONNECTION_LIMIT,
+        keepalive_timeout=API_KEEPALIVE_TIMEOUT,
+        ssl=client_context(),
+    )
+    return ClientSession(
+        connector=connector,
+        cookie_jar=DummyCookieJar(),
+        headers=API_REQUEST_HEADERS,
+        timeout=ClientTimeout(total=API_REQUEST_TIMEOUT),
+    )
+
+
+@dataclass(slots=True)
+class CachedResponse:
+    """Validators and decoded payload of the last response from a URL."""
+
+    etag: str | None
+    last_modified: str | None
+    digest: bytes
+    payload: Any
+
+    def validators(self) -> dict[str, str]:
+        """Return conditional request headers for this response."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class TMMApiClient:
+    """Client for The Modern Milkman endpoints."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        data: dict,
+        session: ClientSession | None = None,
+        login_semaphore: asyncio.Semaphore | None = None,
+    ) -> None:
+        """Initialize API client."""
+        self._owns_session = session is None
+        self.session = session or create_session(hass)
+        self.limiter = async_get_limiter(hass, data)
+        self.metrics = TMMMetrics()
+        self.auth = TMMSessionManager(
+            self.session, data, self.limiter, login_semaphore, self.metrics
+        )
+        self._cache: dict[str, CachedResponse] = {}
+
+    def set_request_timeout(self, seconds: float) -> None:
+        """Give up on each request after this many seconds."""
+        self.auth.timeout = ClientTimeout(total=seconds)
+
+    async def async_login(self) -> None:
+        """Log in and store the returned session."""
+        try:
+            await self.auth.async_login()
+        except (ClientError, TimeoutError) as err:
+            raise APIConnectionError(f"Unable to log in: {err}") from err
+
+    async def async_ensure_login(self) -> None:
+        """Log in only if there is no usable session."""
+        try:
+            await self.auth.async_ensure_login()
+        except (ClientError, TimeoutError) as err:
+            raise APIConnectionError(f"Unable to log in: {err}") from err
+
+    async def async_get_json(self, url: str, allow_missing: bool = False) -> Any:
+        """GET an authenticated endpoint and decode its JSON body.
+
+        Unchanged responses, by ETag/Last-Modified or by body hash, return the
+        previously decoded payload object. Server errors raise
+        APIConnectionError, like an unreachable API. With allow_missing, the
+        statuses meaning nothing is scheduled return None instead of raising.
+        """
+        cached = self._cache.get(url)
+        headers = cached.validators() if cached is not None else {}
+
+        try:
+            resp = await self.auth.async_request(method="GET", url=url, headers=headers)
+            handle_status_code(resp.status)
+
+            if resp.status == 304 and cached is not None:
+                resp.release()
+                return cached.payload
+
+            if resp.status >= 500:
+                resp.release()
+                raise APIConnectionError(f"Status {resp.status} from {url}")
+
+            if resp.status != 200:
+                resp.release()
+                self._cache.pop(url, None)
+                if allow_missing and resp.status in NO_DELIVERY_STATUSES:
+                    return None
+                raise TMMError(f"Unexpected status {resp.status} from {url}")
+
+            body = await resp.read()
+        except (ClientError, TimeoutError) as err:
+            raise APIConnectionError(f"Unable to fetch {url}: {err}") from err
+
+        # Identical bytes decode to the same payload, so hand back the cached one.
+        digest = hashlib.blake2b(body, digest_size=16).digest()
+        if cached is not None and cached.digest == digest:
+            # The server may have rotated its validators for the same body.
+            cached.etag = resp.headers.get("ETag")
+            cached.last_modified = resp.headers.get("Last-Modified")
+            return cached.payload
+
+        payload = json_loads(body)
+        self._cache[url] = CachedResponse(
+            etag=resp.headers.get("ETag"),
+            last_modified=resp.headers.get("Last-Modified"),
+            digest=digest,
+            payload=payload,
+        )
+        return payload
+
+    async def async_get_user_state(self) -> Any:
+        """Return the account holder's details."""
+        with self.metrics.measure(METRIC_USER_STATE):
+            return await self.async_get_json(TMM_USER_STATE_URL)
+
+    async def async_get_endpoint(self, key: str) -> Any:
+        """Return one of the data endpoints by key.
+
+        The next delivery endpoint returns None when nothing is scheduled.
+        """
+        with self.metrics.measure(key):
+            return await self.async_get_json(
+                TMM_DATA_ENDPOINTS[key], allow_missing=key == CONF_NEXT_DELIVERY
+            )
+
+    async def async_close(self) -> None:
+        """Close the HTTP session if this client created it."""
+        if self._owns_session:
+            await self.session.close()
@@ -0,0 +1,68 @@
+"""Circuit breaker for The Modern Milkman API."""
+
+from __future__ import annotations
+
+import time
+from typing import Any
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Stop calling the API after repeated failures and probe on a backoff."""
+
+    def __init__(self, threshold: int, base_delay: float, max_delay: float) -> None:
+        """Initialize circuit breaker."""
+        self.threshold = threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failures = 0
+        self.open_for = base_delay
+        self._opened_at: float | None = None
+
+    @property
+    def state(self) -> str:
+        """Return the current state of the circuit."""
+        if self._opened_at is None:
+            return STATE_CLOSED
+        if self.retry_in > 0:
+            return STATE_OPEN
+        return STATE_HALF_OPEN
+
+    @property
+    def retry_in(self) -> float:
+        """Return the seconds until the next probe is allowed."""
+        if self._opened_at is None:
+            return 0.0
+        return max(self._opened_at + self.open_for - time.monotonic(), 0.0)
+
+    def allow_request(self) -> bool:
+        """Return True if a request may be attempted."""
+        return self.state != STATE_OPEN
+
+    def record_success(self) -> None:
+        """Close the circuit after a successful request."""
+        self.failures = 0
+        self.open_for = self.base_delay
+        self._opened_at = None
+
+    def record_failure(self) -> None:
+        """Count a failure, opening the circuit or backing off a failed probe."""
+        self.failures += 1
+
+        if self.state == STATE_HALF_OPEN:
+            self.open_for = min(self.open_for * 2, self.max_delay)
+            self._opened_at = time.monotonic()
+        elif self._opened_at is None and self.failures >= self.threshold:
+            self._opened_at = time.monotonic()
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the circuit state for diagnostics."""
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "open_for": self.open_for,
+            "retry_in": round(self.retry_in, 1),
+        }
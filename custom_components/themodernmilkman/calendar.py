@@ -1,29 +1,36 @@
 """The Modern Milkman calendar platform."""
 
-from datetime import date, datetime
-import hashlib
-import json
-import uuid
+import asyncio
+from datetime import date, datetime, time, timedelta
+import logging
 
 from homeassistant.components.calendar import CalendarEntity, CalendarEvent
 from homeassistant.components.sensor import SensorDeviceClass
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.exceptions import HomeAssistantError, ServiceValidationError
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
 from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from homeassistant.util import dt as dt_util
 
 from .coordinator import TMMCoordinator
+from .models import TMMNextDelivery
+from .options import entry_calendars
+from .store import TMMExportIndex
 from .const import (
     DOMAIN,
-    CONF_CALENDARS,
-    CONF_NEXT_DELIVERY,
-    CONF_DELIVERYDATE,
-    CONF_UNKNOWN,
+    CONF_COORDINATOR,
+    CONF_CALENDAR_SYNC_TASK,
+    CONF_SYNCED_CALENDARS,
+    CALENDAR_CONCURRENCY_DEFAULT,
+    CALENDAR_SYNC_ATTEMPTS,
+    CALENDAR_SYNC_RETRY_DELAY,
+    CALENDAR_SYNC_TIMEOUT,
 )
 
+_LOGGER = logging.getLogger(__name__)
+
 
 async def async_setup_entry(
     hass: HomeAssistant,
@@ -36,24 +43,35 @@ async def async_setup_entry(
     if entry.options:
         config.update(entry.options)
 
-    calendars = entry.data[CONF_CALENDARS]
-
-    session = async_get_clientsession(hass)
-    coordinator = TMMCoordinator(hass, session, entry.data)
-
-    await coordinator.async_refresh()
-
-    sensors = [TMMCalendarSensor(coordinator, entry.title)]
-
-    for calendar in calendars:
-        if calendar != "None":
-            for sensor in sensors:
-                events = sensor.get_events(datetime.today(), entry.title)
-                for event in events:
-                    await add_to_calendar(hass, calendar, event, entry)
+    calendars = entry_calendars(entry)
+    config[CONF_SYNCED_CALENDARS] = calendars
+
+    coordinator: TMMCoordinator = config[CONF_COORDINATOR]
+
+    sensors = [TMMCalendarSensor(coordinator, entry)]
+
+    targets = [calendar for calendar in calendars if calendar != "None"]
+    if targets:
+        events = [
+            event
+            for sensor in sensors
+            if (event := sensor.get_event(datetime.today())) is not None
+        ]
+        # Export in the background so a slow calendar can't stall entry setup.
+        config[CONF_CALENDAR_SYNC_TASK] = entry.async_create_background_task(
+            hass,
+            export_to_calendars(
+                hass,
+                TMMExportIndex(hass, entry.entry_id),
+                targets,
+                events,
+                coordinator.options.calendar_concurrency,
+            ),
+            f"{DOMAIN}_calendar_sync_{entry.entry_id}",
+        )
 
     if "None" in calendars:
-        async_add_entities(sensors, update_before_add=True)
+        async_add_entities(sensors)
 
 
 async def create_event(hass: HomeAssistant, service_data):
@@ -75,89 +93,180 @@ async def create_event(hass: HomeAssistant, service_data):
         )
 
 
-class DateTimeEncoder(json.JSONEncoder):
-    """Encode date time object."""
-
-    def default(self, o):
-        """Encode date time object."""
-        if isinstance(o, (datetime, date)):
-            return o.isoformat()
-        return super().default(o)
-
-
-def generate_uuid_from_json(json_obj):
-    """Generate a UUID from a JSON object."""
-
-    json_string = json.dumps(json_obj, cls=DateTimeEncoder, sort_keys=True)
-
-    sha1_hash = hashlib.sha1(json_string.encode("utf-8")).digest()
+def event_key(summary, description, location, start) -> tuple[str, str, str, str]:
+    """Return the key used to match an exported event to a calendar event."""
+    return (f"{summary}", f"{description}", f"{location}", f"{start}"[:10])
 
-    return str(uuid.UUID(bytes=sha1_hash[:16]))
 
+def build_service_data(calendar: str, event: CalendarEvent) -> dict:
+    """Return create_event service data for an event."""
+    return {
+        "entity_id": calendar,
+        "start_date": event.start,
+        "end_date": event.end,
+        "summary": event.summary,
+        "description": f"{event.description}",
+        "location": f"{event.location}",
+    }
 
-async def get_event_uid(hass: HomeAssistant, service_data) -> str | None:
-    """Fetch the created event by matching with details in service_data."""
-    entity_id = service_data.get("entity_id")
-    start_time = service_data.get("start_date")
-    end_time = service_data.get("end_date")
 
+async def get_calendar_index(
+    hass: HomeAssistant, calendar: str, start: date, end: date
+) -> set[tuple[str, str, str, str]] | None:
+    """Fetch all events of a calendar in a window with a single service call."""
     try:
-        events = await hass.services.async_call(
+        response = await hass.services.async_call(
             "calendar",
             "get_events",
             {
-                "entity_id": entity_id,
-                "start_date_time": f"{start_time}T00:00:00+0000",
-                "end_date_time": f"{end_time}T00:00:00+0000",
+                "entity_id": calendar,
+                "start_date_time": f"{start}T00:00:00+0000",
+                "end_date_time": f"{end + timedelta(days=1)}T00:00:00+0000",
             },
             return_response=True,
             blocking=True,
         )
     except (ServiceValidationError, HomeAssistantError):
-        events = None
-
-    if events is not None and entity_id in events:
-        for event in events[entity_id].get("events"):
-            if (
-                event["summary"] == service_data["summary"]
-                and f"{event["description"]}" == f"{service_data["description"]}"
-                and f"{event["location"]}" == f"{service_data["location"]}"
-            ):
-                return generate_uuid_from_json(service_data)
+        return None
 
-    return None
+    if response is None or calendar not in response:
+        return None
 
+    return {
+        event_key(
+            event.get("summary"),
+            event.get("description"),
+            event.get("location"),
+            event.get("start"),
+        )
+        for event in response[calendar].get("events", [])
+    }
 
-async def add_to_calendar(
-    hass: HomeAssistant, calendar: str, event: CalendarEvent, entry: ConfigEntry
-):
-    """Add an event to the calendar."""
 
-    service_data = {
-        "entity_id": calendar,
-        "start_date": event.start,
-        "end_date": event.end,
-        "summary": event.summary,
-        "description": f"{event.description}",
-        "location": f"{event.location}",
-    }
+async def sync_calendar(
+    hass: HomeAssistant,
+    index: TMMExportIndex,
+    calendar: str,
+    events: list[CalendarEvent],
+    semaphore: asyncio.Semaphore,
+) -> None:
+    """Create the events missing from one calendar and record them.
+
+    The lookup and each write have their own timeout. A write's timeout only
+    starts once it holds a permit, so waiting behind other calendars' writes
+    can't time it out.
+    """
+    pending = [event for event in events if (calendar, event.start) not in index]
+    if not pending:
+        return
+
+    async with asyncio.timeout(CALENDAR_SYNC_TIMEOUT):
+        existing = await get_calendar_index(
+            hass,
+            calendar,
+            min(event.start for event in pending),
+            max(event.end for event in pending),
+        )
 
-    uid = await get_event_uid(hass, service_data)
+    async def write(event: CalendarEvent, service_data: dict) -> None:
+        async with semaphore, asyncio.timeout(CALENDAR_SYNC_TIMEOUT):
+            await create_event(hass, service_data)
+        index.add(calendar, event.start)
+
+    writes = []
+    for event in pending:
+        service_data = build_service_data(calendar, event)
+        key = event_key(
+            service_data["summary"],
+            service_data["description"],
+            service_data["location"],
+            service_data["start_date"],
+        )
 
-    uids = entry.data.get("uids", [])
+        if existing is None or key not in existing:
+            writes.append(write(event, service_data))
+        else:
+            index.add(calendar, event.start)
 
-    if uid not in uids:
-        await create_event(hass, service_data)
+    # Let every write finish before reporting the first failure.
+    for result in await asyncio.gather(*writes, return_exceptions=True):
+        if isinstance(result, BaseException):
+            raise result
 
-        created_event_uid = await get_event_uid(hass, service_data)
 
-        if created_event_uid is not None and created_event_uid not in uids:
-            uids.append(created_event_uid)
+async def sync_calendars(
+    hass: HomeAssistant,
+    index: TMMExportIndex,
+    calendars: list[str],
+    events: list[CalendarEvent],
+    max_writes: int = CALENDAR_CONCURRENCY_DEFAULT,
+) -> list[str]:
+    """Sync every calendar at once and return the ones that failed.
+
+    Failures and timeouts stay with their calendar, so a slow or failing
+    calendar doesn't hold up the others. Up to max_writes create_event calls
+    run at a time across all calendars.
+    """
+    await index.async_load()
+    semaphore = asyncio.Semaphore(max_writes)
 
-    if uids != entry.data.get("uids", []):
-        updated_data = entry.data.copy()
-        updated_data["uids"] = uids
-        hass.config_entries.async_update_entry(entry, data=updated_data)
+    try:
+        results = await asyncio.gather(
+            *[
+                sync_calendar(hass, index, calendar, events, semaphore)
+                for calendar in calendars
+            ],
+            return_exceptions=True,
+        )
+    finally:
+        # Keep what was written even if some calendars failed.
+        await index.async_save()
+
+    failed = []
+    for calendar, result in zip(calendars, results):
+        if isinstance(result, (TimeoutError, HomeAssistantError)):
+            _LOGGER.debug("Unable to export deliveries to %s: %r", calendar, result)
+            failed.append(calendar)
+        elif isinstance(result, Exception):
+            _LOGGER.error(
+                "Unexpected error exporting deliveries to %s",
+                calendar,
+                exc_info=result,
+            )
+            failed.append(calendar)
+        elif isinstance(result, BaseException):
+            raise result
+
+    return failed
+
+
+async def export_to_calendars(
+    hass: HomeAssistant,
+    index: TMMExportIndex,
+    calendars: list[str],
+    events: list[CalendarEvent],
+    max_writes: int = CALENDAR_CONCURRENCY_DEFAULT,
+) -> None:
+    """Sync events to external calendars, retrying only those that failed."""
+    for attempt in range(1, CALENDAR_SYNC_ATTEMPTS + 1):
+        calendars = await sync_calendars(hass, index, calendars, events, max_writes)
+        if not calendars:
+            return
+
+        if attempt == CALENDAR_SYNC_ATTEMPTS:
+            _LOGGER.warning(
+                "Unable to export deliveries to calendar: %s", ", ".join(calendars)
+            )
+            return
+
+        delay = CALENDAR_SYNC_RETRY_DELAY * 2 ** (attempt - 1)
+        _LOGGER.debug(
+            "Calendar export attempt %s failed for %s, retrying in %ss",
+            attempt,
+            ", ".join(calendars),
+            delay,
+        )
+        await asyncio.sleep(delay)
 
 
 class TMMCalendarSensor(CoordinatorEntity[TMMCoordinator], CalendarEntity):
@@ -166,25 +275,38 @@ class TMMCalendarSensor(CoordinatorEntity[TMMCoordinator], CalendarEntity):
     def __init__(
         self,
         coordinator: TMMCoordinator,
-        name: str,
+        entry: ConfigEntry,
     ) -> None:
         """Initialize."""
+        name = entry.title
         super().__init__(coordinator)
-        self.data = coordinator.data.get(CONF_NEXT_DELIVERY)
+        self.data: TMMNextDelivery = coordinator.data.next_delivery
+        self._written_available: bool | None = None
         self._attr_device_info = DeviceInfo(
-            identifiers={(DOMAIN, f"{DOMAIN}")},
+            identifiers={(DOMAIN, entry.entry_id)},
             manufacturer="The Modern Milkman",
             model="Milkround",
             name=name,
             configuration_url="https://github.com/jampez77/TheModernMilkman/",
         )
-        self._attr_unique_id = f"{DOMAIN}-calendar".lower()
+        self._attr_unique_id = f"{DOMAIN}-{entry.entry_id}-calendar".lower()
         self._attr_name = "Deliveries"
 
     @property
     def available(self) -> bool:
         """Return True if entity is available."""
-        return bool(self.coordinator.data) and (self.data != CONF_UNKNOWN)
+        return bool(self.coordinator.data) and self.data.known
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Handle updated data from the coordinator."""
+        previous = self.data
+        self.data = self.coordinator.data.next_delivery
+        if self.data == previous and self.available == self._written_available:
+            return
+
+        self._written_available = self.available
+        super()._handle_coordinator_update()
 
     @property
     def event(self) -> CalendarEvent | None:
@@ -194,10 +316,10 @@ class TMMCalendarSensor(CoordinatorEntity[TMMCoordinator], CalendarEntity):
     def get_event(self, start_date: datetime) -> CalendarEvent | None:
         """Return calendar event."""
 
-        if self.data == CONF_UNKNOWN:
+        if not self.data.known:
             return None
 
-        value = datetime.fromisoformat(self.data[CONF_DELIVERYDATE]).date()
+        value = self.data.delivery_date
         if value >= start_date.date():
             return CalendarEvent(value, value, "Milkround")
 
@@ -210,8 +332,21 @@ class TMMCalendarSensor(CoordinatorEntity[TMMCoordinator], CalendarEntity):
         end_date: datetime,
     ) -> list[CalendarEvent]:
         """Return calendar events within a datetime range."""
-        event = self.get_event(start_date)
-        if event.start <= end_date.date():
-            return [event]
-
-        return []
+        # The range end is exclusive, a day only counts if the range reaches
+        # past its midnight.
+        end = dt_util.as_local(end_date)
+        until = end.date() if end.time() == time.min else end.date() + timedelta(1)
+
+        history = self.coordinator.history
+        if history is None:
+            event = self.get_event(start_date)
+            if event is not None and event.start < until:
+                return [event]
+            return []
+
+        return [
+            CalendarEvent(delivery_date, delivery_date, "Milkround")
+            for delivery_date in history.between(
+                dt_util.as_local(start_date).date(), until
+            )
+        ]
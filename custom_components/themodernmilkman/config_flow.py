@@ -8,18 +8,15 @@ from typing import Any
 from urllib.parse import urlencode
 
 import voluptuous as vol
-from homeassistant.components.calendar import CalendarEntityFeature
 from homeassistant.config_entries import (
     ConfigEntry,
     ConfigFlow,
     ConfigFlowResult,
     OptionsFlow,
 )
-from homeassistant.helpers import entity_registry as er
 import homeassistant.helpers.config_validation as cv
 from homeassistant.core import HomeAssistant, callback
-from homeassistant.exceptions import HomeAssistantError
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.exceptions import ConfigEntryAuthFailed, HomeAssistantError
 
 from .const import (
     CONF_CALENDARS,
@@ -30,55 +27,56 @@ from .const import (
     CONF_USER,
     CONF_FORENAME,
     CONF_SURNAME,
+    CONF_CALENDAR_CONCURRENCY,
+    CONF_ENDPOINTS,
+    CONF_NEXT_DELIVERY,
+    CONF_REFRESH_MODE,
+    CONF_REFRESH_SPACING,
+    CONF_REQUEST_TIMEOUT,
+    CONF_SCAN_INTERVAL,
+    CONF_SNAPSHOT_TTL,
+    CONF_WASTAGE,
+    POLL_INTERVAL_MIN,
+    REFRESH_MODE_ADAPTIVE,
+    REFRESH_MODE_FIXED,
 )
 
+from .api import TMMApiClient
 from .coordinator import TMMLoginCoordinator
+from .discovery import async_get_calendar_cache
+from .handoff import async_put_handoff
+from .options import TMMOptions, entry_calendars
 
 _LOGGER = logging.getLogger(__name__)
 
 
-async def _get_calendar_entities(hass: HomeAssistant) -> list[str]:
+async def _get_calendar_entities(hass: HomeAssistant) -> dict[str, str]:
     """Retrieve calendar entities."""
-    entity_registry = er.async_get(hass)
-    calendar_entities = {}
-    for entity_id, entity in entity_registry.entities.items():
-        if entity_id.startswith("calendar."):
-            calendar_entity = hass.states.get(entity_id)
-            if calendar_entity:
-                supported_features = calendar_entity.attributes.get(
-                    "supported_features", 0
-                )
-
-                supports_create_event = (
-                    supported_features & CalendarEntityFeature.CREATE_EVENT
-                )
-
-                if supports_create_event:
-                    calendar_name = entity.original_name or entity_id
-                    calendar_entities[entity_id] = calendar_name
-
+    calendar_entities = async_get_calendar_cache(hass).async_entities()
     calendar_entities["None"] = "Create a new calendar"
     return calendar_entities
 
 
-@callback
-def async_get_options_flow(config_entry):
-    """Async options flow."""
-    return TMMFlowHandler(config_entry)
-
-
 async def validate_input(hass: HomeAssistant, data: dict[str, Any]) -> dict[str, Any]:
     """Validate the user input allows us to connect."""
 
-    session = async_get_clientsession(hass)
-    coordinator = TMMLoginCoordinator(hass, session, data)
+    client = TMMApiClient(hass, data)
+    coordinator = TMMLoginCoordinator(hass, client, data)
 
-    await coordinator.async_refresh()
+    try:
+        await coordinator.async_refresh()
+    finally:
+        await client.async_close()
 
-    if coordinator.last_exception is not None and data is not None:
+    if isinstance(coordinator.last_exception, ConfigEntryAuthFailed):
         raise InvalidAuth
+    if coordinator.last_exception is not None:
+        raise CannotConnect
+
+    # Let the new entry reuse this login instead of logging in again.
+    if session := client.auth.export_state():
+        async_put_handoff(hass, data[CONF_USERNAME], session)
 
-    print(coordinator.data)
     user = coordinator.data[CONF_CUSTOMER][CONF_USER]
 
     return {"title": f"{user[CONF_FORENAME]} {user[CONF_SURNAME]}"}
@@ -89,20 +87,17 @@ class ConfigFlow(ConfigFlow, domain=DOMAIN):
 
     VERSION = 1
 
+    @staticmethod
     @callback
-    def _entry_exists(self):
-        """Check if an entry for this domain already exists."""
-        existing_entries = self._async_current_entries()
-        return len(existing_entries) > 0
+    def async_get_options_flow(config_entry: ConfigEntry) -> OptionsFlow:
+        """Get the options flow for this handler."""
+        return TMMFlowHandler()
 
     async def async_step_user(
         self, user_input: dict[str, Any] | None = None
     ) -> ConfigFlowResult:
         """Handle the initial step."""
 
-        if self._entry_exists():
-            return self.async_abort(reason="already_configured")
-
         errors: dict[str, str] = {}
 
         calendar_entities = await _get_calendar_entities(self.hass)
@@ -148,18 +143,61 @@ class ConfigFlow(ConfigFlow, domain=DOMAIN):
 class TMMFlowHandler(OptionsFlow):
     """The Modern Milkman flow handler."""
 
-    def __init__(self, config_entry) -> None:
-        """Init."""
-        self.config_entry = config_entry
-
     async def async_step_init(
         self, user_input: dict[str, Any] | None = None
     ) -> ConfigFlowResult:
         """Manage the options."""
 
+        errors: dict[str, str] = {}
+
+        if user_input is not None:
+            if user_input[CONF_ENDPOINTS]:
+                return self.async_create_entry(data=user_input)
+            errors[CONF_ENDPOINTS] = "no_endpoints"
+
+        options = TMMOptions.from_options(user_input or self.config_entry.options)
+        min_interval = int(POLL_INTERVAL_MIN.total_seconds() // 60)
+
+        calendar_entities = await _get_calendar_entities(self.hass)
+        calendars = (user_input or {}).get(CONF_CALENDARS) or [
+            calendar
+            for calendar in entry_calendars(self.config_entry)
+            if calendar in calendar_entities
+        ]
+
+        OPTIONS_SCHEMA = vol.Schema(
+            {
+                vol.Required(CONF_CALENDARS, default=calendars): cv.multi_select(
+                    calendar_entities
+                ),
+                vol.Required(CONF_REFRESH_MODE, default=options.refresh_mode): vol.In(
+                    [REFRESH_MODE_ADAPTIVE, REFRESH_MODE_FIXED]
+                ),
+                vol.Required(
+                    CONF_SCAN_INTERVAL, default=options.scan_interval
+                ): vol.All(vol.Coerce(int), vol.Range(min=min_interval, max=1440)),
+                vol.Required(
+                    CONF_REQUEST_TIMEOUT, default=options.request_timeout
+                ): vol.All(vol.Coerce(int), vol.Range(min=5, max=120)),
+                vol.Required(
+                    CONF_REFRESH_SPACING, default=options.refresh_spacing
+                ): vol.All(vol.Coerce(int), vol.Range(min=0, max=3600)),
+                vol.Required(
+                    CONF_CALENDAR_CONCURRENCY, default=options.calendar_concurrency
+                ): vol.All(vol.Coerce(int), vol.Range(min=1, max=10)),
+                vol.Required(
+                    CONF_SNAPSHOT_TTL, default=options.snapshot_ttl
+                ): vol.All(vol.Coerce(int), vol.Range(min=0, max=720)),
+                vol.Required(
+                    CONF_ENDPOINTS, default=list(options.endpoints)
+                ): cv.multi_select(
+                    {CONF_WASTAGE: "Wastage", CONF_NEXT_DELIVERY: "Next delivery"}
+                ),
+            }
+        )
+
         return self.async_show_form(
-            step_id="init",
-            data_schema={},
+            step_id="init", data_schema=OPTIONS_SCHEMA, errors=errors
         )
 
 
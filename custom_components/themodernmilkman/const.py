@@ -1,5 +1,7 @@
 """Constants for the Modern Milkman integration."""
 
+from datetime import timedelta
+
 DOMAIN = "themodernmilkman"
 TMM_LOGIN_URL = "https://tmm-website-xi.vercel.app/api/auth/login"
 TMM_NEXT_DELIVERY_URL = "https://tmm-website-xi.vercel.app/api/delivery/next"
@@ -19,6 +21,75 @@ CONF_WASTAGE = "wastage"
 CONF_NEXT_DELIVERY = "next_delivery"
 CONF_DELIVERYDATE = "deliveryDate"
 CONF_UNKNOWN = "Unknown"
+CONF_STALE = "stale"
+CONF_LAST_FETCHED = "last_fetched"
+EVENT_DELIVERY_CHANGED = f"{DOMAIN}_delivery_changed"
+CONF_COORDINATOR = "coordinator"
+CONF_CLIENT = "client"
+CONF_CALENDAR_SYNC_TASK = "calendar_sync_task"
+ORDER_CUTOFF_BEFORE_DELIVERY = timedelta(hours=2)
+POLL_CUTOFF_WINDOW = timedelta(days=1)
+POLL_INTERVAL_IDLE = timedelta(days=1)
+POLL_INTERVAL_CUTOFF_NEAR = timedelta(hours=1)
+POLL_INTERVAL_AFTER_CUTOFF = timedelta(hours=6)
+POLL_INTERVAL_DELIVERY_DUE = timedelta(hours=1)
+POLL_INTERVAL_MIN = timedelta(minutes=15)
+POLL_JITTER = 0.1
+CALENDAR_SYNC_TIMEOUT = 60
+CALENDAR_SYNC_ATTEMPTS = 3
+CALENDAR_SYNC_RETRY_DELAY = 30
+EXPORT_INDEX_RETENTION = timedelta(days=30)
+STORAGE_VERSION = 1
+SNAPSHOT_SAVE_DELAY = 10
+HISTORY_SAVE_DELAY = 10
+SESSION_DEFAULT_LIFETIME = timedelta(hours=12)
+SESSION_EXPIRY_MARGIN = timedelta(minutes=5)
+TMM_DATA_ENDPOINTS = {
+    CONF_WASTAGE: TMM_USER_WASTEAGE_URL,
+    CONF_NEXT_DELIVERY: TMM_NEXT_DELIVERY_URL,
+}
 REQUEST_HEADER = {
     "Content-Type": "application/json",
 }
+API_REQUEST_HEADERS = {
+    "Accept": "application/json",
+    "Accept-Encoding": "gzip, deflate",
+}
+API_REQUEST_TIMEOUT = 30
+API_CONNECTION_LIMIT = 4
+API_KEEPALIVE_TIMEOUT = 60
+# Statuses the next delivery endpoint answers with when nothing is scheduled.
+NO_DELIVERY_STATUSES = (204, 404)
+BREAKER_THRESHOLD = 3
+BREAKER_BASE_DELAY = 60
+BREAKER_MAX_DELAY = 3600
+DATA_POOL = f"{DOMAIN}_pool"
+POOL_MAX_CONCURRENT_LOGINS = 2
+POOL_STAGGER = 30
+DATA_HANDOFF = f"{DOMAIN}_handoff"
+HANDOFF_TTL = 300
+DATA_RATE_LIMITERS = f"{DOMAIN}_rate_limiters"
+RATE_LIMIT_CAPACITY = 10
+RATE_LIMIT_REFILL_SECONDS = 30
+RATE_LIMIT_DEFAULT_RETRY_AFTER = 300
+METRICS_WINDOW = 100
+METRIC_LOGIN = "login"
+METRIC_USER_STATE = "user_state"
+METRIC_REFRESH = "refresh"
+CONF_REFRESH_SPACING = "refresh_spacing"
+REFRESH_SPACING_DEFAULT = 30
+SERVICE_REFRESH = "refresh"
+ATTR_CONFIG_ENTRY_ID = "config_entry_id"
+CONF_REFRESH_MODE = "refresh_mode"
+REFRESH_MODE_ADAPTIVE = "adaptive"
+REFRESH_MODE_FIXED = "fixed"
+CONF_SCAN_INTERVAL = "scan_interval"
+SCAN_INTERVAL_DEFAULT = 60
+CONF_REQUEST_TIMEOUT = "request_timeout"
+CONF_CALENDAR_CONCURRENCY = "calendar_concurrency"
+CALENDAR_CONCURRENCY_DEFAULT = 4
+CONF_SNAPSHOT_TTL = "snapshot_ttl"
+SNAPSHOT_TTL_DEFAULT = 168
+CONF_ENDPOINTS = "endpoints"
+CONF_SYNCED_CALENDARS = "synced_calendars"
+DATA_CALENDAR_CACHE = f"{DOMAIN}_calendar_cache"
@@ -1,96 +1,327 @@
 """The Modren Milkman Coordinator."""
 
-from datetime import timedelta
+import asyncio
+from dataclasses import replace
+from datetime import datetime, timedelta
 import logging
-import json
 from homeassistant.core import HomeAssistant
-from homeassistant.exceptions import ConfigEntryAuthFailed, HomeAssistantError
+from homeassistant.util import dt as dt_util
+from homeassistant.exceptions import ConfigEntryAuthFailed
+from homeassistant.helpers.debounce import Debouncer
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 from .const import (
-    TMM_LOGIN_URL,
-    TMM_NEXT_DELIVERY_URL,
-    TMM_USER_WASTEAGE_URL,
-    CONF_PASSWORD,
-    CONF_USERNAME,
-    TMM_USER_STATE_URL,
-    REQUEST_HEADER,
-    CONF_WASTAGE,
     CONF_NEXT_DELIVERY,
-    CONF_DELIVERYDATE,
     CONF_UNKNOWN,
+    EVENT_DELIVERY_CHANGED,
+    METRIC_REFRESH,
+    POLL_INTERVAL_IDLE,
+    POLL_INTERVAL_MIN,
+    BREAKER_BASE_DELAY,
+    BREAKER_MAX_DELAY,
+    BREAKER_THRESHOLD,
+    RATE_LIMIT_DEFAULT_RETRY_AFTER,
 )
+from .api import TMMApiClient
+from .breaker import CircuitBreaker
+from .exceptions import (
+    APIConnectionError,
+    APIRatelimitExceeded,
+    InvalidAuth,
+    TMMError,
+    UnknownError,
+)
+from .models import TMMData, diff_attributes
+from .options import TMMOptions
+from .scheduler import compute_update_interval
+from .store import TMMDeliveryHistory, TMMSnapshotStore
 
 _LOGGER = logging.getLogger(__name__)
 
 
-class TMMCoordinator(DataUpdateCoordinator):
+class TMMCoordinator(DataUpdateCoordinator[TMMData]):
     """The Modern Milkman coordinator."""
 
-    def __init__(self, hass: HomeAssistant, session, data) -> None:
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        client: TMMApiClient,
+        snapshot: TMMSnapshotStore | None = None,
+        history: TMMDeliveryHistory | None = None,
+        options: TMMOptions | None = None,
+    ) -> None:
         """Initialize coordinator."""
+        options = options or TMMOptions()
 
         super().__init__(
             hass,
             _LOGGER,
             # Name of the data. For logging purposes.
             name="The Modern Milkman",
-            # Polling interval. Will only be polled if there are subscribers.
-            update_interval=timedelta(days=1),
+            # Polling interval. Adjusted after each refresh to the next delivery.
+            update_interval=POLL_INTERVAL_IDLE,
+            # Only notify entities when the parsed data actually changed.
+            always_update=False,
+            # A manual refresh runs at once. Requests while it runs return
+            # straight away, the running fetch covers them. Requests during the
+            # spacing that follows collapse into one fetch when it ends.
+            request_refresh_debouncer=Debouncer(
+                hass, _LOGGER, cooldown=options.refresh_spacing, immediate=True
+            ),
         )
 
-        self.session = session
-        self.body = {
-            CONF_USERNAME: data[CONF_USERNAME],
-            CONF_PASSWORD: data[CONF_PASSWORD],
-        }
+        self.client = client
+        self.options = options
+        self.client.set_request_timeout(options.request_timeout)
+        self.endpoint_errors: dict[str, Exception] = {}
+        self.snapshot = snapshot
+        self.history = history
+        self.last_fetched: datetime | None = None
+        self.stale_since: datetime | None = None
+        self._stale_reason: Exception | None = None
+        self.breaker = CircuitBreaker(
+            BREAKER_THRESHOLD, BREAKER_BASE_DELAY, BREAKER_MAX_DELAY
+        )
+        # Raw endpoint responses, kept for partial refreshes and the snapshot.
+        self.payload: dict = {}
+
+    async def async_restore_snapshot(self) -> bool:
+        """Populate data from the on-disk snapshot, if there is one."""
+        if self.snapshot is None:
+            return False
+
+        restored = await self.snapshot.async_load()
+        if restored is None:
+            return False
+
+        payload, fetched_at = restored
+        if dt_util.utcnow() - fetched_at > self.options.snapshot_max_age:
+            _LOGGER.debug("Ignoring snapshot fetched at %s", fetched_at)
+            return False
+
+        self.payload, self.last_fetched = payload, fetched_at
+        self.data = TMMData.from_payload(self.payload)
+        self._record_history(self.data)
+        self.update_interval = self._interval_for(self.data)
+        _LOGGER.debug("Restored snapshot fetched at %s", self.last_fetched)
+        return True
+
+    async def async_apply_options(self, options: TMMOptions) -> None:
+        """Apply changed options to the running coordinator."""
+        previous, self.options = self.options, options
+
+        self.client.set_request_timeout(options.request_timeout)
+        self._debounced_refresh.cooldown = options.refresh_spacing
+
+        if options.endpoints != previous.endpoints:
+            # Fetch what was added and drop what was removed straight away.
+            await self.async_request_refresh()
+        elif options.fixed_interval != previous.fixed_interval and self.data:
+            self.update_interval = self._interval_for(self.data)
+            self._schedule_refresh()
+
+    @property
+    def stale(self) -> bool:
+        """Return True if the data is being served from before an outage."""
+        return self.stale_since is not None
 
     async def _async_update_data(self):
+        """Fetch data from API endpoint, timing the whole refresh cycle."""
+        with self.client.metrics.measure(METRIC_REFRESH) as measurement:
+            data = await self._async_refresh_data()
+            # Serving stale data means the refresh itself failed.
+            if data.stale_since is not None:
+                measurement.error = self._stale_reason
+            return data
+
+    async def _async_refresh_data(self):
         """Fetch data from API endpoint."""
-        body = {}
-        try:
-            await self.session.request(
-                method="POST",
-                url=TMM_LOGIN_URL,
-                json=self.body,
-                headers=REQUEST_HEADER,
+        if not self.breaker.allow_request():
+            return self._serve_stale(
+                APIConnectionError("Circuit open after repeated failures")
             )
 
-            wastageResp = await self.session.request(
-                method="GET", url=TMM_USER_WASTEAGE_URL
-            )
-
-            wastage = await wastageResp.text()
-
-            body[CONF_WASTAGE] = json.loads(wastage)
+        try:
+            await self.client.async_ensure_login()
 
-            nextDeliveryResp = await self.session.request(
-                method="GET", url=TMM_NEXT_DELIVERY_URL
+            results = await asyncio.gather(
+                *[self._async_fetch_endpoint(key) for key in self.options.endpoints],
+                return_exceptions=True,
             )
-
-            if nextDeliveryResp.status == 200:
-                nextDelivery = await nextDeliveryResp.text()
-                body[CONF_NEXT_DELIVERY] = json.loads(nextDelivery)
-            else:
-                body[CONF_NEXT_DELIVERY] = CONF_UNKNOWN
-
         except InvalidAuth as err:
             raise ConfigEntryAuthFailed from err
+        except APIRatelimitExceeded as err:
+            self._back_off(err)
+            raise UpdateFailed(str(err)) from err
+        except APIConnectionError as err:
+            self.breaker.record_failure()
+            return self._serve_stale(err)
         except TMMError as err:
             raise UpdateFailed(str(err)) from err
-        except ValueError as err:
-            _LOGGER.error("Value error occurred: %s", err)
-            raise UpdateFailed(f"Unexpected response: {err}") from err
         except Exception as err:
             _LOGGER.error("Unexpected exception: %s", err)
             raise UnknownError from err
+
+        results = dict(zip(self.options.endpoints, results))
+        outages = [
+            result
+            for result in results.values()
+            if isinstance(result, APIConnectionError)
+        ]
+        if len(outages) == len(results):
+            self.breaker.record_failure()
+            return self._serve_stale(outages[0])
+
+        # An endpoint failing on its own still counts towards opening the
+        # circuit, the others are merged as usual.
+        if outages:
+            self.breaker.record_failure()
         else:
-            return body
+            self.breaker.record_success()
+        self.stale_since = None
+
+        body = self._merge_endpoint_results(results)
+        self.last_fetched = dt_util.utcnow()
+
+        if self.data is not None and self._unchanged(body):
+            # Nothing changed, skip parsing and the entity update pipeline.
+            self._schedule_next(self.data)
+            if self.snapshot is not None:
+                # Keep the snapshot time current, its TTL counts from here.
+                self.snapshot.async_save(self.payload, self.last_fetched)
+            return replace(self.data, stale_since=None)
+
+        data = TMMData.from_payload(body)
+
+        self.payload = body
+        self._schedule_next(data)
+        self._record_history(data)
+
+        if self.snapshot is not None:
+            self.snapshot.async_save(body, self.last_fetched)
+
+        if self.data is not None:
+            self._fire_delivery_changed(self.data, data)
+
+        return data
+
+    def _record_history(self, data: TMMData) -> None:
+        """Remember the next delivery so it stays on the calendar."""
+        next_delivery = data.next_delivery
+        if self.history is not None and next_delivery.known:
+            self.history.record(next_delivery.delivery_date, dt_util.now().date())
+
+    def _unchanged(self, body: dict) -> bool:
+        """Return True if every endpoint returned the previous payload object."""
+        return body.keys() == self.payload.keys() and all(
+            body[key] is self.payload[key] for key in body
+        )
+
+    def _interval_for(self, data: TMMData, now: datetime | None = None) -> timedelta:
+        """Return the fixed interval, or one adapted to the next delivery."""
+        return self.options.fixed_interval or compute_update_interval(
+            data.next_delivery.delivery_date, now
+        )
+
+    def _schedule_next(self, data: TMMData) -> None:
+        """Set the interval until the next refresh."""
+        self.update_interval = self._interval_for(data, self.last_fetched)
+        self._back_off_endpoint_errors()
+        _LOGGER.debug("Next refresh in %s", self.update_interval)
+
+    def _serve_stale(self, err: Exception) -> TMMData:
+        """Keep serving the last good data while the API is unreachable."""
+        self._stale_reason = err
+        if self.data is None:
+            raise UpdateFailed(str(err)) from err
+
+        if self.stale_since is None:
+            self.stale_since = dt_util.utcnow()
+            _LOGGER.warning(
+                "The Modern Milkman is unreachable, serving data from %s: %s",
+                self.last_fetched,
+                err,
+            )
+
+        # Come back when the breaker allows the next probe.
+        self.update_interval = timedelta(
+            seconds=max(self.breaker.retry_in, POLL_INTERVAL_MIN.total_seconds())
+        )
+        return replace(self.data, stale_since=self.stale_since)
+
+    def _fire_delivery_changed(self, previous: TMMData, current: TMMData) -> None:
+        """Fire an event describing what changed about the next delivery."""
+        old = previous.next_delivery
+        new = current.next_delivery
+        if old == new:
+            return
+
+        self.hass.bus.async_fire(
+            EVENT_DELIVERY_CHANGED,
+            {
+                "config_entry_id": self.config_entry and self.config_entry.entry_id,
+                "previous_delivery_date": old.delivery_date
+                and old.delivery_date.isoformat(),
+                "delivery_date": new.delivery_date and new.delivery_date.isoformat(),
+                "changes": diff_attributes(old.attributes, new.attributes),
+            },
+        )
+
+    async def _async_fetch_endpoint(self, key: str):
+        """Fetch and decode a single data endpoint."""
+        payload = await self.client.async_get_endpoint(key)
+        if payload is None:
+            return CONF_UNKNOWN
+
+        return payload
+
+    def _merge_endpoint_results(self, results: dict) -> dict:
+        """Combine per-endpoint results, keeping previous data for failures."""
+        previous = self.payload
+        body = {}
+        self.endpoint_errors = {}
+
+        for key, result in results.items():
+            if not isinstance(result, BaseException):
+                body[key] = result
+                continue
+
+            if isinstance(result, InvalidAuth):
+                raise ConfigEntryAuthFailed from result
+            if not isinstance(result, Exception):
+                raise result
+
+            _LOGGER.warning("Unable to fetch %s: %s", key, result)
+            self.endpoint_errors[key] = result
+
+            if key in previous:
+                body[key] = previous[key]
+            elif key == CONF_NEXT_DELIVERY:
+                body[key] = CONF_UNKNOWN
+            else:
+                self._back_off_endpoint_errors()
+                raise UpdateFailed(f"Unable to fetch {key}: {result}") from result
+
+        return body
+
+    def _back_off(self, err: APIRatelimitExceeded) -> None:
+        """Push the next refresh back until the rate limit has passed."""
+        retry_after = timedelta(
+            seconds=err.retry_after or RATE_LIMIT_DEFAULT_RETRY_AFTER
+        )
+        if self.update_interval is None or self.update_interval < retry_after:
+            self.update_interval = retry_after
+
+    def _back_off_endpoint_errors(self) -> None:
+        """Back off for any endpoint that was rate limited."""
+        for err in self.endpoint_errors.values():
+            if isinstance(err, APIRatelimitExceeded):
+                self._back_off(err)
 
 
 class TMMLoginCoordinator(DataUpdateCoordinator):
     """Login coordinator."""
 
-    def __init__(self, hass: HomeAssistant, session, data: dict) -> None:
+    def __init__(self, hass: HomeAssistant, client: TMMApiClient, data: dict) -> None:
         """Initialize coordinator."""
         super().__init__(
             hass,
@@ -100,35 +331,16 @@ class TMMLoginCoordinator(DataUpdateCoordinator):
             # Polling interval. Will only be polled if there are subscribers.
             update_interval=None,
         )
-        self.session = session
+        self.client = client
         self.data = dict(data)
 
-        self.body = {
-            CONF_USERNAME: data[CONF_USERNAME],
-            CONF_PASSWORD: data[CONF_PASSWORD],
-        }
-
     async def _async_update_data(self):
         """Fetch data from API endpoint."""
 
-        def handle_status_code(status_code):
-            """Handle status code."""
-            if status_code == 401:
-                raise InvalidAuth("Invalid authentication credentials")
-            if status_code == 429:
-                raise APIRatelimitExceeded("API rate limit exceeded.")
-
         try:
-            if self.body is not None:
-                resp = await self._make_request()
-
-                handle_status_code(resp.status)
-
-                user_resp = await self._make_request_user_state()
-
-                handle_status_code(user_resp.status)
+            await self._make_request()
 
-                body = await user_resp.text()
+            body = await self._make_request_user_state()
 
         except InvalidAuth as err:
             raise ConfigEntryAuthFailed from err
@@ -143,38 +355,16 @@ class TMMLoginCoordinator(DataUpdateCoordinator):
             _LOGGER.error("Unexpected exception: %s", err)
             raise UnknownError from err
         else:
-            return json.loads(body)
+            return body
 
     async def _make_request(self):
         """Make the API request."""
-        return await self.session.request(
-            method="POST", url=TMM_LOGIN_URL, json=self.body, headers=REQUEST_HEADER
-        )
+        return await self.client.async_login()
 
     async def _make_request_user_state(self):
         """Make the API request."""
-        return await self.session.request(method="GET", url=TMM_USER_STATE_URL)
+        return await self.client.async_get_user_state()
 
     async def refresh_tokens(self):
         """Public method to refresh tokens."""
         return await self._async_update_data()
-
-
-class TMMError(HomeAssistantError):
-    """Base error."""
-
-
-class InvalidAuth(TMMError):
-    """Raised when invalid authentication credentials are provided."""
-
-
-class APIRatelimitExceeded(TMMError):
-    """Raised when the API rate limit is exceeded."""
-
-
-class NotFoundError(TMMError):
-    """Raised when the API rate limit is exceeded."""
-
-
-class UnknownError(TMMError):
-    """Raised when an unknown error occurs."""
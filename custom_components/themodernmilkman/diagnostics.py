@@ -0,0 +1,39 @@
+"""Diagnostics support for The Modern Milkman."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .api import TMMApiClient
+from .const import (
+    CONF_CLIENT,
+    CONF_COORDINATOR,
+    CONF_PASSWORD,
+    CONF_USERNAME,
+    DOMAIN,
+)
+from .coordinator import TMMCoordinator
+
+# The title is the account holder's name and the unique id their email.
+TO_REDACT = {CONF_USERNAME, CONF_PASSWORD, "title", "unique_id"}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    client: TMMApiClient = hass.data[DOMAIN][entry.entry_id][CONF_CLIENT]
+    coordinator: TMMCoordinator = hass.data[DOMAIN][entry.entry_id][CONF_COORDINATOR]
+
+    return {
+        "entry": async_redact_data(entry.as_dict(), TO_REDACT),
+        "metrics": client.metrics.as_dict(),
+        "rate_limit": client.limiter.as_dict(),
+        "circuit_breaker": coordinator.breaker.as_dict(),
+        "last_fetched": coordinator.last_fetched,
+        "stale_since": coordinator.stale_since,
+    }
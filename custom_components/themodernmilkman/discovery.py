@@ -0,0 +1,102 @@
+"""Cached discovery of calendars that deliveries can be exported to."""
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+from typing import Any
+
+from homeassistant.components.calendar import CalendarEntityFeature
+from homeassistant.const import ATTR_SUPPORTED_FEATURES, EVENT_STATE_CHANGED, Platform
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
+
+from .const import DATA_CALENDAR_CACHE
+
+CALENDAR_PREFIX = f"{Platform.CALENDAR}."
+
+
+class TMMCalendarCache:
+    """Writable calendars, rebuilt only after a calendar entity changes."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize calendar cache."""
+        self.hass = hass
+        self._entities: dict[str, str] | None = None
+
+    @callback
+    def async_setup(self) -> None:
+        """Listen for calendar changes for as long as Home Assistant runs."""
+        self.hass.bus.async_listen(
+            er.EVENT_ENTITY_REGISTRY_UPDATED,
+            self._async_invalidate,
+            event_filter=_registry_event_is_calendar,
+        )
+        self.hass.bus.async_listen(
+            EVENT_STATE_CHANGED,
+            self._async_invalidate,
+            event_filter=_state_event_changes_features,
+        )
+
+    @callback
+    def _async_invalidate(self, event: Any) -> None:
+        """Forget the cached calendars."""
+        self._entities = None
+
+    @callback
+    def async_entities(self) -> dict[str, str]:
+        """Return writable calendar entity ids mapped to their names."""
+        if self._entities is None:
+            self._entities = self._async_build()
+        return dict(self._entities)
+
+    @callback
+    def _async_build(self) -> dict[str, str]:
+        """Find registered calendars that support creating events."""
+        entity_registry = er.async_get(self.hass)
+        entities = {}
+        # The state machine indexes states by domain, so this only visits
+        # calendars rather than every entity.
+        for state in self.hass.states.async_all(Platform.CALENDAR):
+            supported_features = state.attributes.get(ATTR_SUPPORTED_FEATURES, 0)
+            if not supported_features & CalendarEntityFeature.CREATE_EVENT:
+                continue
+
+            if entity := entity_registry.async_get(state.entity_id):
+                entities[state.entity_id] = entity.original_name or state.entity_id
+
+        return entities
+
+
+@callback
+def _registry_event_is_calendar(event_data: Mapping[str, Any]) -> bool:
+    """Return True if a registry update concerns a calendar."""
+    return any(
+        (event_data.get(key) or "").startswith(CALENDAR_PREFIX)
+        for key in ("entity_id", "old_entity_id")
+    )
+
+
+@callback
+def _state_event_changes_features(event_data: Mapping[str, Any]) -> bool:
+    """Return True if a calendar appeared, went away or changed features."""
+    if not event_data["entity_id"].startswith(CALENDAR_PREFIX):
+        return False
+
+    old_state = event_data.get("old_state")
+    new_state = event_data.get("new_state")
+    if old_state is None or new_state is None:
+        return True
+
+    return old_state.attributes.get(ATTR_SUPPORTED_FEATURES) != (
+        new_state.attributes.get(ATTR_SUPPORTED_FEATURES)
+    )
+
+
+@callback
+def async_get_calendar_cache(hass: HomeAssistant) -> TMMCalendarCache:
+    """Return the calendar cache, creating it on first use."""
+    if DATA_CALENDAR_CACHE not in hass.data:
+        cache = TMMCalendarCache(hass)
+        cache.async_setup()
+        hass.data[DATA_CALENDAR_CACHE] = cache
+    return hass.data[DATA_CALENDAR_CACHE]
@@ -0,0 +1,34 @@
+"""Exceptions for The Modern Milkman integration."""
+
+from __future__ import annotations
+
+from homeassistant.exceptions import HomeAssistantError
+
+
+class TMMError(HomeAssistantError):
+    """Base error."""
+
+
+class InvalidAuth(TMMError):
+    """Raised when invalid authentication credentials are provided."""
+
+
+class APIConnectionError(TMMError):
+    """Raised when the API cannot be reached."""
+
+
+class APIRatelimitExceeded(TMMError):
+    """Raised when the API rate limit is exceeded."""
+
+    def __init__(self, *args, retry_after: float | None = None) -> None:
+        """Initialize with the number of seconds to back off for."""
+        super().__init__(*args)
+        self.retry_after = retry_after
+
+
+class NotFoundError(TMMError):
+    """Raised when the API rate limit is exceeded."""
+
+
+class UnknownError(TMMError):
+    """Raised when an unknown error occurs."""
@@ -0,0 +1,46 @@
+"""Hand the config flow login over to the runtime coordinator."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+import time
+
+from homeassistant.core import HomeAssistant, callback
+
+from .const import DATA_HANDOFF, HANDOFF_TTL
+from .session import SessionState
+
+
+@dataclass(slots=True, frozen=True)
+class TMMHandoff:
+    """Session of a config flow login, waiting for its entry to be set up."""
+
+    session: SessionState
+    created: float
+
+
+@callback
+def async_put_handoff(
+    hass: HomeAssistant, unique_id: str, session: SessionState
+) -> None:
+    """Keep a validated session for the entry about to be created."""
+    handoffs: dict[str, TMMHandoff] = hass.data.setdefault(DATA_HANDOFF, {})
+    _async_purge(handoffs)
+    handoffs[unique_id] = TMMHandoff(session, time.monotonic())
+
+
+@callback
+def async_pop_handoff(hass: HomeAssistant, unique_id: str | None) -> TMMHandoff | None:
+    """Return and forget the handoff for an entry, if it is still fresh."""
+    handoffs: dict[str, TMMHandoff] = hass.data.get(DATA_HANDOFF, {})
+    _async_purge(handoffs)
+    if unique_id is None:
+        return None
+    return handoffs.pop(unique_id, None)
+
+
+def _async_purge(handoffs: dict[str, TMMHandoff]) -> None:
+    """Drop handoffs older than their time to live."""
+    oldest = time.monotonic() - HANDOFF_TTL
+    for unique_id in [key for key, value in handoffs.items() if value.created < oldest]:
+        handoffs.pop(unique_id)
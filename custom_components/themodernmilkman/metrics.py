@@ -0,0 +1,109 @@
+"""Latency and error instrumentation for The Modern Milkman API."""
+
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+import math
+import time
+from typing import Any
+
+from homeassistant.core import CALLBACK_TYPE, callback
+
+from .const import METRICS_WINDOW
+
+
+@dataclass(slots=True)
+class Measurement:
+    """A timed block, which can be marked failed without raising."""
+
+    error: BaseException | None = None
+
+
+class LatencyHistogram:
+    """Rolling window of call durations, with running call and error counts."""
+
+    def __init__(self, window: int) -> None:
+        """Initialize histogram."""
+        self._samples: deque[float] = deque(maxlen=window)
+        self.calls = 0
+        self.errors = 0
+        self.last_error: str | None = None
+
+    def record(self, seconds: float, error: BaseException | None = None) -> None:
+        """Add the duration of a call and whether it failed."""
+        self._samples.append(seconds)
+        self.calls += 1
+        if error is not None:
+            self.errors += 1
+            self.last_error = f"{type(error).__name__}: {error}"
+
+    def percentile(self, percent: float) -> float | None:
+        """Return a nearest-rank percentile of the window in milliseconds."""
+        if not self._samples:
+            return None
+
+        ordered = sorted(self._samples)
+        rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+        return round(ordered[rank - 1] * 1000, 1)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the histogram summary."""
+        return {
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "samples": len(self._samples),
+            "calls": self.calls,
+            "errors": self.errors,
+            "last_error": self.last_error,
+        }
+
+
+class TMMMetrics:
+    """Histograms of every timed operation of one account."""
+
+    def __init__(self, window: int = METRICS_WINDOW) -> None:
+        """Initialize metrics."""
+        self.window = window
+        self.histograms: dict[str, LatencyHistogram] = {}
+        self._listeners: dict[str, list[CALLBACK_TYPE]] = {}
+
+    def get(self, name: str) -> LatencyHistogram:
+        """Return the histogram for an operation, creating it if needed."""
+        if name not in self.histograms:
+            self.histograms[name] = LatencyHistogram(self.window)
+        return self.histograms[name]
+
+    @contextmanager
+    def measure(self, name: str) -> Iterator[Measurement]:
+        """Time the enclosed block and count it as an error if it raises."""
+        started = time.perf_counter()
+        measurement = Measurement()
+        try:
+            yield measurement
+        except Exception as err:
+            measurement.error = err
+            raise
+        finally:
+            self.get(name).record(time.perf_counter() - started, measurement.error)
+            for update_callback in list(self._listeners.get(name, ())):
+                update_callback()
+
+    @callback
+    def async_add_listener(
+        self, name: str, update_callback: CALLBACK_TYPE
+    ) -> Callable[[], None]:
+        """Call update_callback after every measurement of one operation."""
+        self._listeners.setdefault(name, []).append(update_callback)
+
+        @callback
+        def remove_listener() -> None:
+            self._listeners[name].remove(update_callback)
+
+        return remove_listener
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return every histogram summary for diagnostics."""
+        return {name: hist.as_dict() for name, hist in self.histograms.items()}
@@ -0,0 +1,110 @@
+"""Parsed data model for The Modern Milkman."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any
+
+from .const import (
+    CONF_BOTTLESSAVED,
+    CONF_DELIVERYDATE,
+    CONF_NEXT_DELIVERY,
+    CONF_UNKNOWN,
+    CONF_WASTAGE,
+)
+
+
+def flatten_attributes(payload: dict[str, Any]) -> dict[str, Any]:
+    """Flatten one level of nested dicts into prefixed attributes."""
+    attributes: dict[str, Any] = {}
+    for key, value in payload.items():
+        if isinstance(value, dict):
+            attributes.update({f"{key}_{k}": v for k, v in value.items()})
+        else:
+            attributes[key] = value
+    return attributes
+
+
+def diff_attributes(
+    previous: dict[str, Any], current: dict[str, Any]
+) -> dict[str, Any]:
+    """Return the attributes that were added, changed or removed."""
+    changed = {
+        key: value
+        for key, value in current.items()
+        if key not in previous or previous[key] != value
+    }
+    changed.update({key: None for key in previous if key not in current})
+    return changed
+
+
+@dataclass(slots=True, frozen=True)
+class TMMNextDelivery:
+    """Next delivery parsed from the API."""
+
+    delivery_date: date | None = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def known(self) -> bool:
+        """Return True if a delivery is scheduled."""
+        return self.delivery_date is not None
+
+    @classmethod
+    def from_payload(cls, payload: Any) -> TMMNextDelivery:
+        """Parse a next delivery response."""
+        if not isinstance(payload, dict) or payload == CONF_UNKNOWN:
+            return cls()
+
+        try:
+            delivery_date = datetime.fromisoformat(payload[CONF_DELIVERYDATE]).date()
+        except (KeyError, TypeError, ValueError):
+            delivery_date = None
+
+        return cls(delivery_date, flatten_attributes(payload))
+
+
+@dataclass(slots=True, frozen=True)
+class TMMWastage:
+    """Wastage totals parsed from the API."""
+
+    bottles_saved: Any = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+    # Numeric values, imported as long-term statistics instead of attributes.
+    totals: dict[str, float] = field(default_factory=dict)
+
+    @classmethod
+    def from_payload(cls, payload: Any) -> TMMWastage:
+        """Parse a wastage response."""
+        if not isinstance(payload, dict):
+            return cls()
+
+        attributes: dict[str, Any] = {}
+        totals: dict[str, float] = {}
+        for key, value in flatten_attributes(payload).items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                totals[key] = value
+            else:
+                attributes[key] = value
+
+        return cls(payload.get(CONF_BOTTLESSAVED), attributes, totals)
+
+
+@dataclass(slots=True, frozen=True)
+class TMMData:
+    """Everything the coordinator fetched in one refresh."""
+
+    wastage: TMMWastage
+    next_delivery: TMMNextDelivery
+    stale_since: datetime | None = None
+
+    @classmethod
+    def from_payload(cls, payload: dict[str, Any]) -> TMMData:
+        """Parse the combined endpoint responses."""
+        return cls(
+            wastage=TMMWastage.from_payload(payload.get(CONF_WASTAGE)),
+            next_delivery=TMMNextDelivery.from_payload(
+                payload.get(CONF_NEXT_DELIVERY)
+            ),
+        )
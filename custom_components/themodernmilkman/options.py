@@ -0,0 +1,89 @@
+"""Runtime options of a The Modern Milkman config entry."""
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+
+from .const import (
+    API_REQUEST_TIMEOUT,
+    CALENDAR_CONCURRENCY_DEFAULT,
+    CONF_CALENDAR_CONCURRENCY,
+    CONF_CALENDARS,
+    CONF_ENDPOINTS,
+    CONF_REFRESH_MODE,
+    CONF_REFRESH_SPACING,
+    CONF_REQUEST_TIMEOUT,
+    CONF_SCAN_INTERVAL,
+    CONF_SNAPSHOT_TTL,
+    REFRESH_MODE_ADAPTIVE,
+    REFRESH_MODE_FIXED,
+    REFRESH_SPACING_DEFAULT,
+    SCAN_INTERVAL_DEFAULT,
+    SNAPSHOT_TTL_DEFAULT,
+    TMM_DATA_ENDPOINTS,
+)
+
+
+def entry_calendars(entry: ConfigEntry) -> list[str]:
+    """Return the calendars picked in the options, or else at setup."""
+    return list(entry.options.get(CONF_CALENDARS, entry.data[CONF_CALENDARS]))
+
+
+@dataclass(slots=True, frozen=True)
+class TMMOptions:
+    """Options from the options flow, with defaults for anything unset."""
+
+    refresh_mode: str = REFRESH_MODE_ADAPTIVE
+    # Minutes between refreshes in fixed mode.
+    scan_interval: int = SCAN_INTERVAL_DEFAULT
+    # Seconds before a single API request is abandoned.
+    request_timeout: int = API_REQUEST_TIMEOUT
+    calendar_concurrency: int = CALENDAR_CONCURRENCY_DEFAULT
+    # Hours a snapshot may be served from at startup.
+    snapshot_ttl: int = SNAPSHOT_TTL_DEFAULT
+    # Seconds between manually requested refreshes.
+    refresh_spacing: int = REFRESH_SPACING_DEFAULT
+    endpoints: tuple[str, ...] = tuple(TMM_DATA_ENDPOINTS)
+
+    @property
+    def fixed_interval(self) -> timedelta | None:
+        """Return the fixed polling interval, or None in adaptive mode."""
+        if self.refresh_mode != REFRESH_MODE_FIXED:
+            return None
+        return timedelta(minutes=self.scan_interval)
+
+    @property
+    def snapshot_max_age(self) -> timedelta:
+        """Return how old a snapshot may be to be restored."""
+        return timedelta(hours=self.snapshot_ttl)
+
+    @classmethod
+    def from_options(cls, options: Mapping[str, Any]) -> TMMOptions:
+        """Build options from a config entry's options mapping."""
+        defaults = cls()
+        endpoints = options.get(CONF_ENDPOINTS)
+        return cls(
+            refresh_mode=options.get(CONF_REFRESH_MODE, defaults.refresh_mode),
+            scan_interval=options.get(CONF_SCAN_INTERVAL, defaults.scan_interval),
+            request_timeout=options.get(
+                CONF_REQUEST_TIMEOUT, defaults.request_timeout
+            ),
+            calendar_concurrency=options.get(
+                CONF_CALENDAR_CONCURRENCY, defaults.calendar_concurrency
+            ),
+            snapshot_ttl=options.get(CONF_SNAPSHOT_TTL, defaults.snapshot_ttl),
+            refresh_spacing=options.get(
+                CONF_REFRESH_SPACING, defaults.refresh_spacing
+            ),
+            # Keep the API's endpoint order whatever order they were picked in.
+            endpoints=tuple(
+                key
+                for key in TMM_DATA_ENDPOINTS
+                if endpoints is None or key in endpoints
+            ),
+        )
@@ -0,0 +1,74 @@
+"""Shared resources for all The Modern Milkman accounts."""
+
+from __future__ import annotations
+
+import asyncio
+
+from aiohttp import ClientSession
+
+from homeassistant.const import EVENT_HOMEASSISTANT_CLOSE
+from homeassistant.core import Event, HomeAssistant, callback
+
+from .api import create_session
+from .const import DATA_POOL, POOL_MAX_CONCURRENT_LOGINS, POOL_STAGGER
+
+
+class TMMPool:
+    """One HTTP pool, a login cap and staggered refreshes for every account."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize pool."""
+        self.hass = hass
+        self.login_semaphore = asyncio.Semaphore(POOL_MAX_CONCURRENT_LOGINS)
+        self._session: ClientSession | None = None
+        self._slots: dict[str, int] = {}
+
+    @callback
+    def async_setup(self) -> None:
+        """Close the HTTP session when Home Assistant stops.
+
+        Config entries are not unloaded at shutdown, so the last unregister
+        never runs then.
+        """
+        self.hass.bus.async_listen_once(EVENT_HOMEASSISTANT_CLOSE, self._async_close)
+
+    @property
+    def session(self) -> ClientSession:
+        """Return the shared HTTP session, creating it on first use."""
+        if self._session is None or self._session.closed:
+            self._session = create_session(self.hass)
+        return self._session
+
+    def register(self, entry_id: str) -> float:
+        """Add an account and return how long its first refresh should wait.
+
+        Only refreshes after a restored snapshot wait, see async_setup_entry.
+        """
+        if entry_id not in self._slots:
+            used = set(self._slots.values())
+            self._slots[entry_id] = next(
+                slot for slot in range(len(used) + 1) if slot not in used
+            )
+        return self._slots[entry_id] * POOL_STAGGER
+
+    async def async_unregister(self, entry_id: str) -> None:
+        """Remove an account, closing the HTTP session after the last one."""
+        self._slots.pop(entry_id, None)
+        if not self._slots:
+            await self._async_close()
+
+    async def _async_close(self, event: Event | None = None) -> None:
+        """Close the HTTP session, if one is open."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+@callback
+def async_get_pool(hass: HomeAssistant) -> TMMPool:
+    """Return the pool shared by all config entries."""
+    if DATA_POOL not in hass.data:
+        pool = TMMPool(hass)
+        pool.async_setup()
+        hass.data[DATA_POOL] = pool
+    return hass.data[DATA_POOL]
@@ -0,0 +1,120 @@
+"""Per-account request rate limiting for The Modern Milkman API."""
+
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+import logging
+import time
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    CONF_USERNAME,
+    DATA_RATE_LIMITERS,
+    RATE_LIMIT_CAPACITY,
+    RATE_LIMIT_REFILL_SECONDS,
+)
+from .exceptions import APIRatelimitExceeded
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Token bucket that also honours server supplied Retry-After delays."""
+
+    def __init__(self, capacity: int, refill_seconds: float) -> None:
+        """Initialize token bucket."""
+        self.capacity = capacity
+        self.refill_seconds = refill_seconds
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    @property
+    def tokens(self) -> float:
+        """Return the number of requests that can be made right now."""
+        self._refill()
+        return self._tokens
+
+    @property
+    def blocked_for(self) -> float:
+        """Return how many seconds remain of a Retry-After block."""
+        return max(self._blocked_until - time.monotonic(), 0.0)
+
+    def _refill(self) -> None:
+        """Add the tokens earned since the last update."""
+        now = time.monotonic()
+        earned = (now - self._updated) / self.refill_seconds
+        self._tokens = min(self.capacity, self._tokens + earned)
+        self._updated = now
+
+    async def async_acquire(self) -> None:
+        """Wait until a request may be made and take a token for it.
+
+        While the server has asked us to back off this fails fast instead of
+        waiting out the Retry-After delay.
+        """
+        async with self._lock:
+            while True:
+                if (blocked := self.blocked_for) > 0:
+                    raise APIRatelimitExceeded(
+                        "API rate limit exceeded.", retry_after=blocked
+                    )
+
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                wait = (1 - self._tokens) * self.refill_seconds
+                _LOGGER.debug("Request budget exhausted, waiting %.1fs", wait)
+                await asyncio.sleep(wait)
+
+    def block_for(self, seconds: float) -> None:
+        """Hold back all requests for the given number of seconds."""
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the current budget for diagnostics."""
+        return {
+            "capacity": self.capacity,
+            "tokens": round(self.tokens, 2),
+            "refill_seconds": self.refill_seconds,
+            "blocked_for": round(self.blocked_for, 1),
+        }
+
+
+def async_get_limiter(hass: HomeAssistant, data: dict) -> TokenBucket:
+    """Return the token bucket for an account, shared across reloads."""
+    limiters: dict[str, TokenBucket] = hass.data.setdefault(DATA_RATE_LIMITERS, {})
+    username = data[CONF_USERNAME]
+    if username not in limiters:
+        limiters[username] = TokenBucket(
+            RATE_LIMIT_CAPACITY, RATE_LIMIT_REFILL_SECONDS
+        )
+    return limiters[username]
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Return the number of seconds a Retry-After header asks us to wait."""
+    if not value:
+        return None
+
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+
+    try:
+        retry_at: datetime = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    return max((retry_at - dt_util.utcnow()).total_seconds(), 0.0)
@@ -0,0 +1,62 @@
+"""Delivery aware polling schedule for The Modern Milkman."""
+
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta
+import random
+
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    ORDER_CUTOFF_BEFORE_DELIVERY,
+    POLL_CUTOFF_WINDOW,
+    POLL_INTERVAL_AFTER_CUTOFF,
+    POLL_INTERVAL_CUTOFF_NEAR,
+    POLL_INTERVAL_DELIVERY_DUE,
+    POLL_INTERVAL_IDLE,
+    POLL_INTERVAL_MIN,
+    POLL_JITTER,
+)
+
+
+def order_cutoff(delivery_date: date) -> datetime:
+    """Return the last moment the order for a delivery can be changed."""
+    start = dt_util.as_utc(
+        datetime.combine(delivery_date, time.min, dt_util.get_default_time_zone())
+    )
+    return start - ORDER_CUTOFF_BEFORE_DELIVERY
+
+
+def base_interval(delivery_date: date | None, now: datetime) -> timedelta:
+    """Return the polling interval for the current stage of a delivery."""
+    if delivery_date is None:
+        return POLL_INTERVAL_IDLE
+
+    until_cutoff = order_cutoff(delivery_date) - now
+
+    if until_cutoff > POLL_CUTOFF_WINDOW:
+        # Nothing due soon, but wake up when the cutoff window opens.
+        return max(
+            min(POLL_INTERVAL_IDLE, until_cutoff - POLL_CUTOFF_WINDOW),
+            POLL_INTERVAL_MIN,
+        )
+    if until_cutoff > timedelta(0):
+        return max(min(POLL_INTERVAL_CUTOFF_NEAR, until_cutoff), POLL_INTERVAL_MIN)
+    if dt_util.as_local(now).date() <= delivery_date:
+        return POLL_INTERVAL_AFTER_CUTOFF
+
+    # The delivery has passed, pick up the next one promptly.
+    return POLL_INTERVAL_DELIVERY_DUE
+
+
+def compute_update_interval(
+    delivery_date: date | None, now: datetime | None = None
+) -> timedelta:
+    """Return a jittered polling interval for the next delivery date."""
+    now = now or dt_util.utcnow()
+    interval = base_interval(delivery_date, now)
+
+    jitter = interval.total_seconds() * POLL_JITTER
+    seconds = interval.total_seconds() + random.uniform(-jitter, jitter)
+
+    return max(timedelta(seconds=seconds), POLL_INTERVAL_MIN)
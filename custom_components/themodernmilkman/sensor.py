@@ -2,32 +2,46 @@
 
 from datetime import date
 from typing import Any
-from datetime import datetime
 
 from homeassistant.components.sensor import (
     SensorEntity,
     SensorEntityDescription,
     SensorDeviceClass,
+    SensorStateClass,
 )
 from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import EntityCategory, UnitOfTime
 from homeassistant.core import HomeAssistant, callback
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
 from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import (
     CoordinatorEntity,
     DataUpdateCoordinator,
 )
+from homeassistant.util import slugify
 
 from .const import (
-    CONF_WASTAGE,
-    CONF_BOTTLESSAVED,
     DOMAIN,
+    CONF_CLIENT,
+    CONF_COORDINATOR,
+    CONF_LAST_FETCHED,
     CONF_NEXT_DELIVERY,
-    CONF_DELIVERYDATE,
-    CONF_UNKNOWN,
+    CONF_STALE,
+    CONF_WASTAGE,
+    METRIC_LOGIN,
+    METRIC_REFRESH,
 )
 from .coordinator import TMMCoordinator
+from .metrics import TMMMetrics
+from .models import TMMNextDelivery, TMMWastage
+
+# Timed operations that get a latency sensor, with the sensor name.
+LATENCY_SENSORS = {
+    METRIC_LOGIN: "Login Latency",
+    CONF_WASTAGE: "Wastage Latency",
+    CONF_NEXT_DELIVERY: "Next Delivery Latency",
+    METRIC_REFRESH: "Refresh Latency",
+}
 
 
 async def async_setup_entry(
@@ -42,20 +56,23 @@ async def async_setup_entry(
         config.update(entry.options)
 
     if entry.data:
-        session = async_get_clientsession(hass)
-
-        coordinator = TMMCoordinator(hass, session, entry.data)
+        coordinator: TMMCoordinator = config[CONF_COORDINATOR]
 
-        await coordinator.async_config_entry_first_refresh()
-
-        wastage_sensor = TMMWastageSensor(coordinator, entry.title)
-        next_delivery_sensor = TMMNextDeliverySensor(coordinator, entry.title)
+        wastage_sensor = TMMWastageSensor(coordinator, entry)
+        next_delivery_sensor = TMMNextDeliverySensor(coordinator, entry)
 
         sensors = [wastage_sensor, next_delivery_sensor]
         for sensor in sensors:
             hass.data[DOMAIN][sensor.unique_id] = sensor
 
-        async_add_entities(sensors, update_before_add=True)
+        # The coordinator already has data, refreshes happen in the background.
+        async_add_entities(sensors)
+
+        metrics: TMMMetrics = config[CONF_CLIENT].metrics
+        async_add_entities(
+            TMMLatencySensor(metrics, entry, metric, name)
+            for metric, name in LATENCY_SENSORS.items()
+        )
 
 
 class TMMNextDeliverySensor(CoordinatorEntity[DataUpdateCoordinator], SensorEntity):
@@ -64,87 +81,73 @@ class TMMNextDeliverySensor(CoordinatorEntity[DataUpdateCoordinator], SensorEnti
     def __init__(
         self,
         coordinator: DataUpdateCoordinator,
-        name: str,
+        entry: ConfigEntry,
     ) -> None:
         """Initialize."""
+        name = entry.title
         super().__init__(coordinator)
         self.coordinator = coordinator
         self._attr_device_info = DeviceInfo(
-            identifiers={(DOMAIN, f"{DOMAIN}")},
+            identifiers={(DOMAIN, entry.entry_id)},
             manufacturer="The Modern Milkman",
             model="Milkround",
             name=name,
             configuration_url="https://github.com/jampez77/TheModernMilkman/",
         )
-        self.data = coordinator.data.get(CONF_NEXT_DELIVERY)
+        self.data: TMMNextDelivery = coordinator.data.next_delivery
         sensor_id = f"{DOMAIN}_next_delivery".lower()
-        # Set the unique ID based on domain, name, and sensor type
-        self._attr_unique_id = f"{DOMAIN}-{name}-next_delivery".lower()
-        self.entity_id = "sensor.themodernmilkman_next_delivery"
-
-        self.device_class = SensorDeviceClass.DATE
-        if self.data == CONF_UNKNOWN:
-            self.device_class = None
+        # Set the unique ID based on domain, config entry, and sensor type
+        self._attr_unique_id = f"{DOMAIN}-{entry.entry_id}-next_delivery".lower()
+        self.entity_id = f"sensor.{DOMAIN}_{slugify(name)}_next_delivery"
 
         self.entity_description = SensorEntityDescription(
             key="themodernmilkman_next_delivery",
             name="Next Delivery",
             icon="mdi:truck-delivery",
-            device_class=self.device_class,
+            device_class=SensorDeviceClass.DATE,
         )
         self._name = self.entity_description.name
         self._sensor_id = sensor_id
-        self.attrs: dict[str, Any] = {}
+        self.attrs: dict[str, Any] = self.data.attributes
         self._available = True
-        self._attr_force_update = True
+        self._written: tuple[bool, bool] | None = None
         self._attr_icon = self.entity_description.icon
         self._state = self.get_state()
 
-    def update_from_coordinator(self):
-        """Update sensor state and attributes from coordinator data."""
+    def update_from_coordinator(self) -> bool:
+        """Update sensor state and attributes, returning True if they changed."""
+        previous = self.data
+        self.data = self.coordinator.data.next_delivery
+        if self.data == previous:
+            return False
 
         self._state = self.get_state()
+        self.attrs = self.data.attributes
+        return True
 
-        attributes = {}
-
-        if self.data is not None and self.data != CONF_UNKNOWN:
-            for key, value in self.data.items():
-                if isinstance(value, dict):
-                    attributes.update({f"{key}_{k}": v for k, v in value.items()})
-                else:
-                    attributes[key] = value
-
-        self.attrs = attributes
-
-    def get_state(self) -> str | date:
-        """Get entity state."""
-        if self.data == CONF_UNKNOWN:
-            return CONF_UNKNOWN
+    def get_state(self) -> date | None:
+        """Get entity state, None while no delivery is scheduled."""
+        if not self.data.known:
+            return None
 
-        return datetime.fromisoformat(self.data[CONF_DELIVERYDATE]).date()
+        return self.data.delivery_date
 
     @callback
     def _handle_coordinator_update(self) -> None:
         """Handle updated data from the coordinator."""
-        self.update_from_coordinator()
-        self.async_write_ha_state()
+        changed = self.update_from_coordinator()
+        written = (self.available, self.coordinator.stale)
+        if not changed and written == self._written:
+            return
 
-    async def async_added_to_hass(self) -> None:
-        """Handle adding to Home Assistant."""
-        await super().async_added_to_hass()
-        await self.async_update()
+        self._written = written
+        self.async_write_ha_state()
 
     @property
     def name(self) -> str:
         """Process name."""
         return self._name
 
-    async def update_parcel(self) -> None:
-        """Safely update the name of the entity."""
-        await self.coordinator.async_request_refresh()
-
-        super()._handle_coordinator_update()
-
     @property
     def available(self) -> bool:
         """Return if the entity is available."""
@@ -156,14 +159,21 @@ class TMMNextDeliverySensor(CoordinatorEntity[DataUpdateCoordinator], SensorEnti
         return self._attr_icon
 
     @property
-    def native_value(self) -> str | date | None:
+    def native_value(self) -> date | None:
         """Native value."""
         return self._state
 
     @property
     def extra_state_attributes(self) -> dict[str, Any]:
         """Define entity attributes."""
-        return self.attrs
+        if not self.coordinator.stale:
+            return self.attrs
+
+        return {
+            **self.attrs,
+            CONF_STALE: True,
+            CONF_LAST_FETCHED: self.coordinator.last_fetched,
+        }
 
 
 class TMMWastageSensor(CoordinatorEntity[DataUpdateCoordinator], SensorEntity):
@@ -172,23 +182,24 @@ class TMMWastageSensor(CoordinatorEntity[DataUpdateCoordinator], SensorEntity):
     def __init__(
         self,
         coordinator: DataUpdateCoordinator,
-        name: str,
+        entry: ConfigEntry,
     ) -> None:
         """Initialize."""
+        name = entry.title
         super().__init__(coordinator)
         self.coordinator = coordinator
         self._attr_device_info = DeviceInfo(
-            identifiers={(DOMAIN, f"{DOMAIN}")},
+            identifiers={(DOMAIN, entry.entry_id)},
             manufacturer="The Modern Milkman",
             model="Milkround",
             name=name,
             configuration_url="https://github.com/jampez77/TheModernMilkman/",
         )
-        self.data = coordinator.data.get(CONF_WASTAGE)
+        self.data: TMMWastage = coordinator.data.wastage
         sensor_id = f"{DOMAIN}_wastage".lower()
-        # Set the unique ID based on domain, name, and sensor type
-        self._attr_unique_id = f"{DOMAIN}-{name}-wastage".lower()
-        self.entity_id = "sensor.themodernmilkman_wastage"
+        # Set the unique ID based on domain, config entry, and sensor type
+        self._attr_unique_id = f"{DOMAIN}-{entry.entry_id}-wastage".lower()
+        self.entity_id = f"sensor.{DOMAIN}_{slugify(name)}_wastage"
         self.entity_description = SensorEntityDescription(
             key="themodernmilkman_wastage",
             name="Wastage",
@@ -196,49 +207,39 @@ class TMMWastageSensor(CoordinatorEntity[DataUpdateCoordinator], SensorEntity):
         )
         self._name = self.entity_description.name
         self._sensor_id = sensor_id
-        self.attrs: dict[str, Any] = {}
+        self.attrs: dict[str, Any] = self.data.attributes
         self._available = True
-        self._attr_force_update = True
+        self._written: tuple[bool, bool] | None = None
         self._attr_icon = self.entity_description.icon
-        self._state = self.data[CONF_BOTTLESSAVED]
+        self._state = self.data.bottles_saved
 
-    def update_from_coordinator(self):
-        """Update sensor state and attributes from coordinator data."""
+    def update_from_coordinator(self) -> bool:
+        """Update sensor state and attributes, returning True if they changed."""
+        previous = self.data
+        self.data = self.coordinator.data.wastage
+        if self.data == previous:
+            return False
 
-        self._state = self.data[CONF_BOTTLESSAVED]
-
-        attributes = {}
-
-        for key, value in self.data.items():
-            if isinstance(value, dict):
-                attributes.update({f"{key}_{k}": v for k, v in value.items()})
-            else:
-                attributes[key] = value
-
-        self.attrs = attributes
+        self._state = self.data.bottles_saved
+        self.attrs = self.data.attributes
+        return True
 
     @callback
     def _handle_coordinator_update(self) -> None:
         """Handle updated data from the coordinator."""
-        self.update_from_coordinator()
-        self.async_write_ha_state()
+        changed = self.update_from_coordinator()
+        written = (self.available, self.coordinator.stale)
+        if not changed and written == self._written:
+            return
 
-    async def async_added_to_hass(self) -> None:
-        """Handle adding to Home Assistant."""
-        await super().async_added_to_hass()
-        await self.async_update()
+        self._written = written
+        self.async_write_ha_state()
 
     @property
     def name(self) -> str:
         """Process name."""
         return self._name
 
-    async def update_parcel(self) -> None:
-        """Safely update the name of the entity."""
-        await self.coordinator.async_request_refresh()
-
-        super()._handle_coordinator_update()
-
     @property
     def available(self) -> bool:
         """Return if the entity is available."""
@@ -257,4 +258,62 @@ class TMMWastageSensor(CoordinatorEntity[DataUpdateCoordinator], SensorEntity):
     @property
     def extra_state_attributes(self) -> dict[str, Any]:
         """Define entity attributes."""
-        return self.attrs
+        if not self.coordinator.stale:
+            return self.attrs
+
+        return {
+            **self.attrs,
+            CONF_STALE: True,
+            CONF_LAST_FETCHED: self.coordinator.last_fetched,
+        }
+
+
+class TMMLatencySensor(SensorEntity):
+    """Define a diagnostic sensor for the p95 latency of an API operation."""
+
+    _attr_should_poll = False
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _attr_icon = "mdi:timer-outline"
+
+    def __init__(
+        self,
+        metrics: TMMMetrics,
+        entry: ConfigEntry,
+        metric: str,
+        name: str,
+    ) -> None:
+        """Initialize."""
+        self.metrics = metrics
+        self.metric = metric
+        title = entry.title
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, entry.entry_id)},
+            manufacturer="The Modern Milkman",
+            model="Milkround",
+            name=title,
+            configuration_url="https://github.com/jampez77/TheModernMilkman/",
+        )
+        self._attr_name = name
+        self._attr_unique_id = f"{DOMAIN}-{entry.entry_id}-{metric}_latency".lower()
+        self.entity_id = f"sensor.{DOMAIN}_{slugify(title)}_{metric}_latency"
+
+    async def async_added_to_hass(self) -> None:
+        """Handle adding to Home Assistant."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            self.metrics.async_add_listener(self.metric, self.async_write_ha_state)
+        )
+
+    @property
+    def native_value(self) -> float | None:
+        """Return the p95 latency over the rolling window."""
+        return self.metrics.get(self.metric).percentile(95)
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Define entity attributes."""
+        return self.metrics.get(self.metric).as_dict()
@@ -0,0 +1,53 @@
+"""Services for The Modern Milkman integration."""
+
+from __future__ import annotations
+
+import asyncio
+
+import voluptuous as vol
+
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.core import HomeAssistant, ServiceCall, callback
+from homeassistant.exceptions import ServiceValidationError
+import homeassistant.helpers.config_validation as cv
+
+from .const import ATTR_CONFIG_ENTRY_ID, CONF_COORDINATOR, DOMAIN, SERVICE_REFRESH
+from .coordinator import TMMCoordinator
+
+REFRESH_SCHEMA = vol.Schema(
+    {vol.Optional(ATTR_CONFIG_ENTRY_ID): vol.All(cv.ensure_list, [cv.string])}
+)
+
+
+@callback
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the integration services."""
+
+    async def async_refresh(call: ServiceCall) -> None:
+        """Refresh one or every account.
+
+        Each coordinator debounces requests, so concurrent calls for the same
+        account share a single fetch.
+        """
+        loaded = {
+            entry.entry_id
+            for entry in hass.config_entries.async_entries(DOMAIN)
+            if entry.state is ConfigEntryState.LOADED
+        }
+        entry_ids = call.data.get(ATTR_CONFIG_ENTRY_ID) or loaded
+
+        if missing := set(entry_ids) - loaded:
+            raise ServiceValidationError(
+                f"Not a loaded The Modern Milkman entry: {', '.join(sorted(missing))}"
+            )
+
+        coordinators: list[TMMCoordinator] = [
+            hass.data[DOMAIN][entry_id][CONF_COORDINATOR] for entry_id in entry_ids
+        ]
+        await asyncio.gather(
+            *[coordinator.async_request_refresh() for coordinator in coordinators]
+        )
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_REFRESH, async_refresh, schema=REFRESH_SCHEMA
+    )
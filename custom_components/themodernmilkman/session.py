@@ -0,0 +1,254 @@
+"""The Modern Milkman authenticated session manager."""
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
+import logging
+from typing import Any
+
+from aiohttp import ClientResponse, ClientSession, ClientTimeout
+
+from homeassistant.util import dt as dt_util
+from homeassistant.util.json import json_loads
+
+from .const import (
+    CONF_ACCESS_TOKEN,
+    CONF_COOKIE_NAME,
+    CONF_PASSWORD,
+    CONF_USERNAME,
+    RATE_LIMIT_DEFAULT_RETRY_AFTER,
+    REQUEST_HEADER,
+    SESSION_DEFAULT_LIFETIME,
+    METRIC_LOGIN,
+    SESSION_EXPIRY_MARGIN,
+    TMM_LOGIN_URL,
+)
+from .exceptions import (
+    APIConnectionError,
+    APIRatelimitExceeded,
+    InvalidAuth,
+    TMMError,
+)
+from .metrics import TMMMetrics
+from .ratelimit import TokenBucket, parse_retry_after
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(slots=True, frozen=True)
+class SessionState:
+    """Authenticated session that can be handed to another manager."""
+
+    cookies: dict[str, str]
+    access_token: str | None
+    expires_at: datetime | None
+
+
+class TMMSessionManager:
+    """Keep the session cookie and access token alive between refreshes."""
+
+    def __init__(
+        self,
+        session: ClientSession,
+        data: dict,
+        limiter: TokenBucket | None = None,
+        login_semaphore: asyncio.Semaphore | None = None,
+        metrics: TMMMetrics | None = None,
+    ) -> None:
+        """Initialize session manager."""
+        self.session = session
+        self.limiter = limiter
+        self.login_semaphore = login_semaphore
+        self.metrics = metrics or TMMMetrics()
+        # Per-request timeout, overriding the shared session's default.
+        self.timeout: ClientTimeout | None = None
+        self.body = {
+            CONF_USERNAME: data[CONF_USERNAME],
+            CONF_PASSWORD: data[CONF_PASSWORD],
+        }
+        self.cookies: dict[str, str] = {}
+        self.access_token: str | None = None
+        self.expires_at: datetime | None = None
+        self.authenticated = False
+        self.generation = 0
+        self._login_lock = asyncio.Lock()
+
+    @property
+    def is_valid(self) -> bool:
+        """Return True if the current session can still be used."""
+        if not self.authenticated:
+            return False
+        if self.expires_at is None:
+            return True
+        return dt_util.utcnow() < self.expires_at - SESSION_EXPIRY_MARGIN
+
+    def export_state(self) -> SessionState | None:
+        """Return the current session, if it is still usable."""
+        if not self.is_valid:
+            return None
+        return SessionState(dict(self.cookies), self.access_token, self.expires_at)
+
+    def restore_state(self, state: SessionState) -> None:
+        """Adopt a session obtained elsewhere instead of logging in."""
+        self.cookies = dict(state.cookies)
+        self.access_token = state.access_token
+        self.expires_at = state.expires_at
+        self.authenticated = True
+        self.generation += 1
+
+    def invalidate(self) -> None:
+        """Forget the current session so the next request logs in again."""
+        self.cookies = {}
+        self.access_token = None
+        self.expires_at = None
+        self.authenticated = False
+
+    async def async_login(self) -> ClientResponse:
+        """Post the credentials and store the returned session."""
+        if self.login_semaphore is None:
+            with self.metrics.measure(METRIC_LOGIN):
+                return await self._async_login()
+
+        async with self.login_semaphore:
+            with self.metrics.measure(METRIC_LOGIN):
+                return await self._async_login()
+
+    async def _async_login(self) -> ClientResponse:
+        """Post the credentials and store the returned session."""
+        resp = await self._request(
+            method="POST", url=TMM_LOGIN_URL, json=self.body, headers=REQUEST_HEADER
+        )
+        handle_status_code(resp.status)
+
+        # Anything but success is an outage or a rejected request, not a login.
+        if resp.status >= 500:
+            resp.release()
+            raise APIConnectionError(f"Login failed with status {resp.status}")
+        if not 200 <= resp.status < 300:
+            resp.release()
+            raise TMMError(f"Login failed with status {resp.status}")
+
+        self.invalidate()
+
+        # The shared HTTP session has no cookie jar, so keep this account's
+        # cookies here and send them with each request.
+        self.cookies = {name: morsel.value for name, morsel in resp.cookies.items()}
+        morsel = resp.cookies.get(CONF_COOKIE_NAME)
+
+        try:
+            login = json_loads(await resp.read())
+        except ValueError:
+            login = None
+        if isinstance(login, dict):
+            self.access_token = login.get("accessToken") or login.get(
+                CONF_ACCESS_TOKEN
+            )
+
+        if morsel is None and self.access_token is None:
+            self.invalidate()
+            raise TMMError("Login response carried no session")
+
+        self.expires_at = _cookie_expiry(morsel) or (
+            dt_util.utcnow() + SESSION_DEFAULT_LIFETIME
+        )
+        self.authenticated = True
+        _LOGGER.debug("Logged in, session valid until %s", self.expires_at)
+
+        return resp
+
+    async def async_ensure_login(self, stale_generation: int | None = None) -> None:
+        """Log in only if there is no usable session.
+
+        Concurrent callers share a single login; passing the generation of a
+        session that was rejected forces a new login unless another caller
+        already replaced it.
+        """
+        async with self._login_lock:
+            if stale_generation is not None and stale_generation == self.generation:
+                self.invalidate()
+            if not self.is_valid:
+                await self.async_login()
+                self.generation += 1
+
+    async def async_request(
+        self, method: str, url: str, **kwargs: Any
+    ) -> ClientResponse:
+        """Make an authenticated request, logging in again once on a 401."""
+        await self.async_ensure_login()
+
+        generation = self.generation
+        resp = await self._request(method=method, url=url, **self._auth(kwargs))
+
+        if resp.status == 401:
+            _LOGGER.debug("Session rejected by %s, logging in again", url)
+            resp.release()
+            await self.async_ensure_login(stale_generation=generation)
+            resp = await self._request(method=method, url=url, **self._auth(kwargs))
+
+        return resp
+
+    async def _request(self, method: str, url: str, **kwargs: Any) -> ClientResponse:
+        """Send a request through the rate limiter, honouring Retry-After."""
+        if self.limiter is not None:
+            await self.limiter.async_acquire()
+
+        if self.timeout is not None:
+            kwargs.setdefault("timeout", self.timeout)
+        resp = await self.session.request(method=method, url=url, **kwargs)
+
+        if resp.status == 429:
+            retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+            if retry_after is None:
+                retry_after = RATE_LIMIT_DEFAULT_RETRY_AFTER
+            _LOGGER.warning("Rate limited by %s, backing off %ss", url, retry_after)
+            resp.release()
+            if self.limiter is not None:
+                self.limiter.block_for(retry_after)
+            raise APIRatelimitExceeded(
+                "API rate limit exceeded.", retry_after=retry_after
+            )
+
+        return resp
+
+    def _auth(self, kwargs: dict[str, Any]) -> dict[str, Any]:
+        """Attach the session cookie and access token to request kwargs."""
+        kwargs = dict(kwargs)
+        if self.cookies:
+            kwargs["cookies"] = {**kwargs.get("cookies", {}), **self.cookies}
+        if self.access_token is not None:
+            kwargs["headers"] = {
+                **kwargs.get("headers", {}),
+                "Authorization": f"Bearer {self.access_token}",
+            }
+        return kwargs
+
+
+def handle_status_code(status_code: int) -> None:
+    """Handle status code."""
+    if status_code == 401:
+        raise InvalidAuth("Invalid authentication credentials")
+    if status_code == 429:
+        raise APIRatelimitExceeded("API rate limit exceeded.")
+
+
+def _cookie_expiry(morsel) -> datetime | None:
+    """Return the expiry of the session cookie, if it advertises one."""
+    if morsel is None:
+        return None
+
+    if max_age := morsel.get("max-age"):
+        try:
+            return dt_util.utcnow() + timedelta(seconds=int(max_age))
+        except ValueError:
+            pass
+
+    if expires := morsel.get("expires"):
+        try:
+            return parsedate_to_datetime(expires)
+        except (TypeError, ValueError):
+            pass
+
+    return None
@@ -0,0 +1,57 @@
+"""Long-term statistics for The Modern Milkman wastage totals."""
+
+from __future__ import annotations
+
+from homeassistant.components.recorder.models import StatisticData, StatisticMetaData
+from homeassistant.components.recorder.statistics import async_add_external_statistics
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.util import dt as dt_util, slugify
+
+from .const import DOMAIN
+from .models import TMMWastage
+
+
+class TMMWastageStatistics:
+    """Import wastage totals as external statistics."""
+
+    def __init__(self, hass: HomeAssistant, entry: ConfigEntry) -> None:
+        """Initialize wastage statistics."""
+        self.hass = hass
+        self.entry = entry
+        self._account = slugify(entry.entry_id)
+        self._imported: dict[str, float] = {}
+
+    def statistic_id(self, key: str) -> str:
+        """Return the external statistic id for a wastage total."""
+        return f"{DOMAIN}:{self._account}_{slugify(key)}"
+
+    @callback
+    def async_import(self, wastage: TMMWastage) -> None:
+        """Import the totals that changed since the last import.
+
+        Rows land in the current hour, so repeated imports within an hour
+        overwrite rather than add to the statistics.
+        """
+        changed = {
+            key: value
+            for key, value in wastage.totals.items()
+            if self._imported.get(key) != value
+        }
+        if not changed:
+            return
+
+        start = dt_util.utcnow().replace(minute=0, second=0, microsecond=0)
+        for key, value in changed.items():
+            metadata = StatisticMetaData(
+                has_mean=False,
+                has_sum=True,
+                name=f"{self.entry.title} {key}",
+                source=DOMAIN,
+                statistic_id=self.statistic_id(key),
+                unit_of_measurement=None,
+            )
+            statistics = [StatisticData(start=start, state=value, sum=value)]
+            async_add_external_statistics(self.hass, metadata, statistics)
+
+        self._imported.update(changed)
@@ -0,0 +1,173 @@
+"""The Modern Milkman persistent storage."""
+
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    DOMAIN,
+    EXPORT_INDEX_RETENTION,
+    HISTORY_SAVE_DELAY,
+    SNAPSHOT_SAVE_DELAY,
+    STORAGE_VERSION,
+)
+
+
+class TMMSnapshotStore:
+    """Persist the last good coordinator payload for a config entry."""
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Initialize snapshot store."""
+        self._store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.snapshot"
+        )
+
+    async def async_load(self) -> tuple[dict[str, Any], datetime] | None:
+        """Return the stored payload and when it was fetched."""
+        stored = await self._store.async_load()
+        if not stored or "data" not in stored:
+            return None
+
+        fetched_at = dt_util.parse_datetime(stored.get("fetched_at") or "")
+        if fetched_at is None:
+            return None
+
+        return stored["data"], fetched_at
+
+    def async_save(self, data: dict[str, Any], fetched_at: datetime) -> None:
+        """Schedule the payload to be written to disk."""
+        self._store.async_delay_save(
+            lambda: {"data": data, "fetched_at": fetched_at.isoformat()},
+            SNAPSHOT_SAVE_DELAY,
+        )
+
+    async def async_remove(self) -> None:
+        """Remove the stored payload."""
+        await self._store.async_remove()
+
+
+class TMMExportIndex:
+    """Index of deliveries already exported to each external calendar."""
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Initialize export index."""
+        self._store: Store[dict[str, list[str]]] = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.exported"
+        )
+        self._exported: set[tuple[str, str]] = set()
+        self._dirty = False
+        self._loaded = False
+
+    async def async_load(self) -> None:
+        """Load the index and drop deliveries past the retention window."""
+        if self._loaded:
+            return
+
+        stored = await self._store.async_load() or {}
+        self._exported = {
+            (calendar, delivery_date)
+            for calendar, delivery_dates in stored.items()
+            for delivery_date in delivery_dates
+        }
+        self._dirty = False
+        self._loaded = True
+        self.prune()
+
+    def __contains__(self, key: tuple[str, date]) -> bool:
+        """Return True if a delivery has been exported to a calendar."""
+        calendar, delivery_date = key
+        return (calendar, delivery_date.isoformat()) in self._exported
+
+    def add(self, calendar: str, delivery_date: date) -> None:
+        """Record a delivery as exported to a calendar."""
+        key = (calendar, delivery_date.isoformat())
+        if key not in self._exported:
+            self._exported.add(key)
+            self._dirty = True
+
+    def prune(self) -> None:
+        """Forget deliveries older than the retention window."""
+        oldest = (dt_util.now().date() - EXPORT_INDEX_RETENTION).isoformat()
+        kept = {key for key in self._exported if key[1] >= oldest}
+        if len(kept) != len(self._exported):
+            self._exported = kept
+            self._dirty = True
+
+    async def async_save(self) -> None:
+        """Write the index to disk if it changed."""
+        if not self._dirty:
+            return
+
+        stored: dict[str, list[str]] = {}
+        for calendar, delivery_date in sorted(self._exported):
+            stored.setdefault(calendar, []).append(delivery_date)
+
+        await self._store.async_save(stored)
+        self._dirty = False
+
+    async def async_remove(self) -> None:
+        """Remove the stored index."""
+        await self._store.async_remove()
+
+
+class TMMDeliveryHistory:
+    """Date sorted history of every delivery the API has reported.
+
+    Only the dates are kept, they are all the calendar reads.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Initialize delivery history."""
+        self._store: Store[list[str]] = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.history"
+        )
+        self._dates: list[date] = []
+
+    async def async_load(self) -> None:
+        """Load the history from disk."""
+        stored = await self._store.async_load() or []
+        self._dates = sorted(date.fromisoformat(value) for value in stored)
+
+    def __len__(self) -> int:
+        """Return the number of deliveries recorded."""
+        return len(self._dates)
+
+    def record(self, delivery_date: date, today: date) -> None:
+        """Record the next delivery, keeping the history sorted by date.
+
+        Deliveries after today but before the next one were skipped or moved,
+        so they are dropped.
+        """
+        lower = bisect_right(self._dates, today)
+        upper = bisect_left(self._dates, delivery_date)
+        changed = lower < upper
+        if changed:
+            del self._dates[lower:upper]
+
+        index = bisect_left(self._dates, delivery_date)
+        if index == len(self._dates) or self._dates[index] != delivery_date:
+            self._dates.insert(index, delivery_date)
+            changed = True
+
+        if changed:
+            self._store.async_delay_save(self._data_to_save, HISTORY_SAVE_DELAY)
+
+    def between(self, start: date, end: date) -> list[date]:
+        """Return the deliveries from start up to but excluding end."""
+        lower = bisect_left(self._dates, start)
+        upper = bisect_left(self._dates, end)
+        return self._dates[lower:upper]
+
+    def _data_to_save(self) -> list[str]:
+        """Return the history in its on-disk form."""
+        return [delivery_date.isoformat() for delivery_date in self._dates]
+
+    async def async_remove(self) -> None:
+        """Remove the stored history."""
+        await self._store.async_remove()
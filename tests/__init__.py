@@ -0,0 +1,4 @@
+"""Tests for The Modern Milkman integration."""
+
+# Entity id of the next delivery sensor of the stub account.
+NEXT_DELIVERY_ENTITY = "sensor.themodernmilkman_ada_lovelace_next_delivery"
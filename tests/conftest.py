@@ -0,0 +1,89 @@
+"""Fixtures for The Modern Milkman tests."""
+
+from __future__ import annotations
+
+from collections.abc import AsyncGenerator
+from unittest.mock import patch
+
+from aiohttp import ThreadedResolver
+import pytest
+
+from custom_components.themodernmilkman.const import (
+    CONF_CALENDARS,
+    CONF_NEXT_DELIVERY,
+    CONF_PASSWORD,
+    CONF_USERNAME,
+    CONF_WASTAGE,
+    DOMAIN,
+)
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from .stub_server import (
+    LOGIN_PATH,
+    NEXT_DELIVERY_PATH,
+    PASSWORD,
+    USER_STATE_PATH,
+    USERNAME,
+    WASTAGE_PATH,
+    TMMStubServer,
+)
+
+
+@pytest.fixture(autouse=True)
+def auto_enable_custom_integrations(recorder_mock, enable_custom_integrations):
+    """Enable custom integrations in every test.
+
+    The integration depends on the recorder, which has to be set up before
+    hass, so every test gets it here.
+    """
+    return
+
+
+@pytest.fixture
+async def stub(socket_enabled) -> AsyncGenerator[TMMStubServer]:
+    """Run the stub API and point the integration at it."""
+    server = TMMStubServer()
+    await server.start()
+
+    endpoints = {
+        CONF_WASTAGE: server.url(WASTAGE_PATH),
+        CONF_NEXT_DELIVERY: server.url(NEXT_DELIVERY_PATH),
+    }
+    with (
+        patch(
+            "custom_components.themodernmilkman.session.TMM_LOGIN_URL",
+            server.url(LOGIN_PATH),
+        ),
+        patch(
+            "custom_components.themodernmilkman.api.TMM_USER_STATE_URL",
+            server.url(USER_STATE_PATH),
+        ),
+        patch.dict(
+            "custom_components.themodernmilkman.api.TMM_DATA_ENDPOINTS", endpoints
+        ),
+        # The stub is on localhost, and the aiodns resolver leaves a thread
+        # behind that fails the test cleanup checks.
+        patch("aiohttp.connector.DefaultResolver", ThreadedResolver),
+        # Benchmarks make far more requests than the real request budget.
+        patch(
+            "custom_components.themodernmilkman.ratelimit.RATE_LIMIT_CAPACITY", 1000
+        ),
+    ):
+        yield server
+
+    await server.close()
+
+
+@pytest.fixture
+def config_entry() -> MockConfigEntry:
+    """Return a config entry for the stub account."""
+    return MockConfigEntry(
+        domain=DOMAIN,
+        title="Ada Lovelace",
+        unique_id=USERNAME,
+        data={
+            CONF_USERNAME: USERNAME,
+            CONF_PASSWORD: PASSWORD,
+            CONF_CALENDARS: ["None"],
+        },
+    )
@@ -0,0 +1,178 @@
+"""Offline stub of The Modern Milkman API."""
+
+from __future__ import annotations
+
+import asyncio
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+import hashlib
+import json
+from typing import Any
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+LOGIN_PATH = "/api/auth/login"
+USER_STATE_PATH = "/api/user/state"
+WASTAGE_PATH = "/api/user/wastage"
+NEXT_DELIVERY_PATH = "/api/delivery/next"
+
+USERNAME = "milk@example.com"
+PASSWORD = "semi-skimmed"
+SESSION_COOKIE = "__Secure-session"
+
+
+@dataclass
+class StubConfig:
+    """Behaviour of the stub, changeable while it runs."""
+
+    # Seconds to wait before answering, per path.
+    latency: dict[str, float] = field(default_factory=dict)
+    # Status code to answer with instead of the payload, per path.
+    errors: dict[str, int] = field(default_factory=dict)
+    # Seconds to put in Retry-After when answering 429.
+    retry_after: int = 60
+    # Number of extra items to pad each payload with.
+    payload_items: int = 0
+    delivery_date: date = field(
+        default_factory=lambda: date.today() + timedelta(days=2)
+    )
+    bottles_saved: int = 120
+    # Bumped to rotate the ETags of the data endpoints without changing them.
+    etag_version: int = 0
+
+
+class TMMStubServer:
+    """aiohttp server answering the login, user state and data endpoints."""
+
+    def __init__(self, config: StubConfig | None = None) -> None:
+        """Initialize stub server."""
+        self.config = config or StubConfig()
+        self.requests: Counter[str] = Counter()
+        # Conditional requests answered with 304, per path.
+        self.not_modified: Counter[str] = Counter()
+        app = web.Application()
+        app.router.add_post(LOGIN_PATH, self._login)
+        app.router.add_get(USER_STATE_PATH, self._user_state)
+        app.router.add_get(WASTAGE_PATH, self._wastage)
+        app.router.add_get(NEXT_DELIVERY_PATH, self._next_delivery)
+        self.server = TestServer(app)
+
+    async def start(self) -> None:
+        """Start listening on a free local port."""
+        await self.server.start_server()
+
+    async def close(self) -> None:
+        """Stop the server."""
+        await self.server.close()
+
+    def url(self, path: str) -> str:
+        """Return the absolute URL of a path on the stub."""
+        return str(self.server.make_url(path))
+
+    @property
+    def total_requests(self) -> int:
+        """Return the number of requests served so far."""
+        return sum(self.requests.values())
+
+    def reset_counts(self) -> None:
+        """Forget the requests served so far."""
+        self.requests.clear()
+        self.not_modified.clear()
+
+    async def _prepare(self, request: web.Request) -> web.Response | None:
+        """Count, delay and fail a request as configured.
+
+        Responses are empty mappings and so falsy, compare the result to None.
+        """
+        self.requests[request.path] += 1
+
+        if latency := self.config.latency.get(request.path):
+            await asyncio.sleep(latency)
+
+        if status := self.config.errors.get(request.path):
+            headers = {}
+            if status == 429:
+                headers["Retry-After"] = str(self.config.retry_after)
+            return web.Response(status=status, headers=headers)
+
+        if request.path != LOGIN_PATH and (
+            request.cookies.get(SESSION_COOKIE) != "stub-session"
+        ):
+            return web.Response(status=401)
+
+        return None
+
+    def _padding(self) -> list[dict[str, str]]:
+        """Return filler items to grow the payload."""
+        return [
+            {"id": f"item-{index}", "name": "Semi skimmed milk 1 pint"}
+            for index in range(self.config.payload_items)
+        ]
+
+    def _conditional(self, request: web.Request, payload: Any) -> web.Response:
+        """Answer with the payload and its ETag, or 304 if the client has it."""
+        body = json.dumps(payload).encode()
+        digest = hashlib.sha256(body).hexdigest()[:16]
+        etag = f'"{self.config.etag_version}-{digest}"'
+
+        if request.headers.get("If-None-Match") == etag:
+            self.not_modified[request.path] += 1
+            return web.Response(status=304, headers={"ETag": etag})
+
+        return web.Response(
+            body=body, content_type="application/json", headers={"ETag": etag}
+        )
+
+    async def _login(self, request: web.Request) -> web.Response:
+        """Answer a login."""
+        if (failed := await self._prepare(request)) is not None:
+            return failed
+
+        body = await request.json()
+        # Any example.com account works, so benchmarks can load several.
+        username = body.get("username") or ""
+        if not username.endswith("@example.com") or body.get("password") != PASSWORD:
+            return web.Response(status=401)
+
+        response = web.json_response({"accessToken": "stub-token"})
+        response.set_cookie(SESSION_COOKIE, "stub-session", max_age=3600)
+        return response
+
+    async def _user_state(self, request: web.Request) -> web.Response:
+        """Answer the user state endpoint."""
+        if (failed := await self._prepare(request)) is not None:
+            return failed
+
+        return web.json_response(
+            {"customer": {"user": {"forename": "Ada", "surname": "Lovelace"}}}
+        )
+
+    async def _wastage(self, request: web.Request) -> web.Response:
+        """Answer the wastage endpoint."""
+        if (failed := await self._prepare(request)) is not None:
+            return failed
+
+        return self._conditional(
+            request,
+            {
+                "bottlesSaved": self.config.bottles_saved,
+                "wheelieBins": {"saved": 1.5},
+                "items": self._padding(),
+            },
+        )
+
+    async def _next_delivery(self, request: web.Request) -> web.Response:
+        """Answer the next delivery endpoint."""
+        if (failed := await self._prepare(request)) is not None:
+            return failed
+
+        return self._conditional(
+            request,
+            {
+                "deliveryDate": self.config.delivery_date.isoformat(),
+                "order": {"total": 4.2},
+                "items": self._padding(),
+            },
+        )
@@ -0,0 +1,323 @@
+"""Benchmarks for the refresh path, run against the offline stub API.
+
+Each benchmark prints its measurements, run with ``pytest -s`` to see them.
+The assertions pin the request counts so regressions in batching or caching
+fail loudly, while timings are only reported.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from datetime import timedelta
+import time
+import tracemalloc
+from unittest.mock import patch
+
+from homeassistant.components.calendar import CalendarEvent
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.core import HomeAssistant, ServiceCall, SupportsResponse
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.util import dt as dt_util
+
+from custom_components.themodernmilkman.calendar import sync_calendars
+from custom_components.themodernmilkman.const import (
+    CONF_COORDINATOR,
+    DOMAIN,
+    REFRESH_SPACING_DEFAULT,
+)
+from custom_components.themodernmilkman.store import TMMExportIndex
+from pytest_homeassistant_custom_component.common import (
+    MockConfigEntry,
+    async_fire_time_changed,
+)
+
+from .stub_server import (
+    LOGIN_PATH,
+    NEXT_DELIVERY_PATH,
+    PASSWORD,
+    USER_STATE_PATH,
+    WASTAGE_PATH,
+    TMMStubServer,
+)
+
+REFRESH_CYCLES = 20
+ENTRY_COUNT = 5
+
+
+def _report(name: str, **values: float) -> None:
+    """Print one benchmark result."""
+    print(name, " ".join(f"{key}={value:.4g}" for key, value in values.items()))
+
+
+async def test_cold_setup(
+    hass: HomeAssistant, stub: TMMStubServer, config_entry
+) -> None:
+    """Measure a cold setup: one login and one GET per data endpoint."""
+    config_entry.add_to_hass(hass)
+
+    started = time.perf_counter()
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    elapsed = time.perf_counter() - started
+
+    assert config_entry.state is ConfigEntryState.LOADED
+    assert stub.requests[LOGIN_PATH] == 1
+    assert stub.requests[WASTAGE_PATH] == 1
+    assert stub.requests[NEXT_DELIVERY_PATH] == 1
+    assert stub.requests[USER_STATE_PATH] == 0
+    _report("cold_setup", seconds=elapsed, requests=stub.total_requests)
+
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+
+
+async def test_refresh_latency(
+    hass: HomeAssistant, stub: TMMStubServer, config_entry
+) -> None:
+    """Measure steady-state refreshes against an unchanged API."""
+    config_entry.add_to_hass(hass)
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    coordinator = hass.data[DOMAIN][config_entry.entry_id][CONF_COORDINATOR]
+
+    stub.reset_counts()
+    timings = []
+    for _ in range(REFRESH_CYCLES):
+        started = time.perf_counter()
+        await coordinator.async_refresh()
+        timings.append(time.perf_counter() - started)
+
+    # The session stays valid, so every cycle is just the data endpoints.
+    assert stub.requests[LOGIN_PATH] == 0
+    assert stub.total_requests == 2 * REFRESH_CYCLES
+    timings.sort()
+    _report(
+        "refresh",
+        p50=timings[len(timings) // 2],
+        p95=timings[int(len(timings) * 0.95) - 1],
+        requests_per_cycle=stub.total_requests / REFRESH_CYCLES,
+    )
+
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+
+
+async def test_refresh_after_expiry(
+    hass: HomeAssistant, stub: TMMStubServer, config_entry
+) -> None:
+    """Measure a refresh that has to log in again first."""
+    config_entry.add_to_hass(hass)
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    coordinator = hass.data[DOMAIN][config_entry.entry_id][CONF_COORDINATOR]
+
+    stub.reset_counts()
+    coordinator.client.auth.invalidate()
+    started = time.perf_counter()
+    await coordinator.async_refresh()
+    elapsed = time.perf_counter() - started
+
+    assert stub.requests[LOGIN_PATH] == 1
+    assert stub.total_requests == 3
+    _report("refresh_after_expiry", seconds=elapsed, requests=stub.total_requests)
+
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+
+
+async def test_refresh_service_storm(
+    hass: HomeAssistant, stub: TMMStubServer, config_entry
+) -> None:
+    """Measure the API load of many concurrent refresh service calls."""
+    config_entry.add_to_hass(hass)
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    coordinator = hass.data[DOMAIN][config_entry.entry_id][CONF_COORDINATOR]
+
+    # Start outside any cooldown left over from setup.
+    coordinator._debounced_refresh.async_cancel()
+    stub.reset_counts()
+    started = time.perf_counter()
+    await asyncio.gather(
+        *[
+            hass.services.async_call(DOMAIN, "refresh", blocking=True)
+            for _ in range(REFRESH_CYCLES)
+        ]
+    )
+    elapsed = time.perf_counter() - started
+
+    # The first call fetches, the others arrive while it runs and are dropped.
+    assert stub.total_requests == 2
+    _report("refresh_storm", seconds=elapsed, requests=stub.total_requests)
+
+    # Calls during the cooldown collapse into one fetch at its end.
+    for _ in range(REFRESH_CYCLES):
+        await hass.services.async_call(DOMAIN, "refresh", blocking=True)
+    assert stub.total_requests == 2
+
+    async_fire_time_changed(
+        hass, dt_util.utcnow() + timedelta(seconds=REFRESH_SPACING_DEFAULT + 1)
+    )
+    await hass.async_block_till_done()
+    assert stub.total_requests == 4
+
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+
+
+async def test_calendar_sync_calls(hass: HomeAssistant) -> None:
+    """Count the service calls of a calendar export, then of a repeat."""
+    calls: dict[str, int] = {"get_events": 0, "create_event": 0}
+
+    async def get_events(call: ServiceCall):
+        calls["get_events"] += 1
+        return {call.data["entity_id"]: {"events": []}}
+
+    async def create_event(call: ServiceCall):
+        calls["create_event"] += 1
+
+    hass.services.async_register(
+        "calendar", "get_events", get_events, supports_response=SupportsResponse.ONLY
+    )
+    hass.services.async_register("calendar", "create_event", create_event)
+
+    start = dt_util.now().date() + timedelta(days=2)
+    events = [
+        CalendarEvent(
+            summary="Milk delivery",
+            start=start + timedelta(days=days),
+            end=start + timedelta(days=days + 1),
+        )
+        for days in range(7)
+    ]
+    calendars = ["calendar.home", "calendar.work"]
+    index = TMMExportIndex(hass, "benchmark")
+
+    started = time.perf_counter()
+    await sync_calendars(hass, index, calendars, events)
+    elapsed = time.perf_counter() - started
+
+    # One lookup per calendar, one write per missing event.
+    assert calls == {"get_events": 2, "create_event": 14}
+    _report("calendar_sync", seconds=elapsed, **calls)
+
+    # Exported events are remembered, a repeat makes no calls at all.
+    await sync_calendars(hass, index, calendars, events)
+    assert calls == {"get_events": 2, "create_event": 14}
+
+
+async def test_calendar_fan_out(hass: HomeAssistant) -> None:
+    """Measure a calendar export where one calendar is slow and one fails."""
+    latency = 0.2
+    written: dict[str, int] = {}
+
+    async def get_events(call: ServiceCall):
+        return {call.data["entity_id"]: {"events": []}}
+
+    async def create_event(call: ServiceCall):
+        entity_id = call.data["entity_id"]
+        if entity_id == "calendar.broken":
+            raise HomeAssistantError("Calendar is read only")
+        await asyncio.sleep(latency)
+        written[entity_id] = written.get(entity_id, 0) + 1
+
+    hass.services.async_register(
+        "calendar", "get_events", get_events, supports_response=SupportsResponse.ONLY
+    )
+    hass.services.async_register("calendar", "create_event", create_event)
+
+    start = dt_util.now().date() + timedelta(days=2)
+    events = [
+        CalendarEvent(summary="Milk delivery", start=start, end=start + timedelta(1))
+    ]
+    calendars = ["calendar.home", "calendar.work", "calendar.broken"]
+
+    started = time.perf_counter()
+    failed = await sync_calendars(
+        hass, TMMExportIndex(hass, "benchmark"), calendars, events
+    )
+    elapsed = time.perf_counter() - started
+
+    # The failure stays with its calendar and the others write side by side.
+    assert failed == ["calendar.broken"]
+    assert written == {"calendar.home": 1, "calendar.work": 1}
+    assert elapsed < 2 * latency
+    _report("calendar_fan_out", seconds=elapsed, calendars=len(calendars))
+
+
+async def test_calendar_waiting_for_permit(hass: HomeAssistant) -> None:
+    """Check that waiting behind a slow calendar doesn't time a write out."""
+    written: list[str] = []
+
+    async def get_events(call: ServiceCall):
+        return {call.data["entity_id"]: {"events": []}}
+
+    async def create_event(call: ServiceCall):
+        entity_id = call.data["entity_id"]
+        await asyncio.sleep(0.25 if entity_id == "calendar.slow" else 0)
+        written.append(entity_id)
+
+    hass.services.async_register(
+        "calendar", "get_events", get_events, supports_response=SupportsResponse.ONLY
+    )
+    hass.services.async_register("calendar", "create_event", create_event)
+
+    start = dt_util.now().date() + timedelta(days=2)
+    events = [
+        CalendarEvent(
+            summary="Milk delivery",
+            start=start + timedelta(days=days),
+            end=start + timedelta(days=days + 1),
+        )
+        for days in range(2)
+    ]
+
+    # One write at a time, each well within the timeout on its own.
+    with patch(
+        "custom_components.themodernmilkman.calendar.CALENDAR_SYNC_TIMEOUT", 0.3
+    ):
+        failed = await sync_calendars(
+            hass,
+            TMMExportIndex(hass, "benchmark"),
+            ["calendar.slow", "calendar.fast"],
+            events,
+            max_writes=1,
+        )
+
+    assert failed == []
+    assert sorted(written) == ["calendar.fast"] * 2 + ["calendar.slow"] * 2
+
+
+async def test_memory_per_entry(
+    hass: HomeAssistant, stub: TMMStubServer
+) -> None:
+    """Measure the memory held by each loaded config entry."""
+    stub.config.payload_items = 50
+    entries = [
+        MockConfigEntry(
+            domain=DOMAIN,
+            title=f"Account {index}",
+            unique_id=f"milk{index}@example.com",
+            data={
+                "username": f"milk{index}@example.com",
+                "password": PASSWORD,
+                "calendars": ["None"],
+            },
+        )
+        for index in range(ENTRY_COUNT)
+    ]
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    for entry in entries:
+        entry.add_to_hass(hass)
+        assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert all(entry.state is ConfigEntryState.LOADED for entry in entries)
+    _report(
+        "memory",
+        bytes_per_entry=(after - before) / ENTRY_COUNT,
+        peak_bytes=peak - before,
+    )
+
+    for entry in entries:
+        assert await hass.config_entries.async_unload(entry.entry_id)
@@ -0,0 +1,161 @@
+"""Tests for The Modern Milkman config and options flows."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.calendar import CalendarEntityFeature
+from homeassistant.config_entries import SOURCE_USER, ConfigEntryState
+from homeassistant.const import ATTR_SUPPORTED_FEATURES, STATE_UNKNOWN
+from homeassistant.core import HomeAssistant
+from homeassistant.data_entry_flow import FlowResultType
+from homeassistant.helpers import entity_registry as er
+
+from custom_components.themodernmilkman.const import (
+    CONF_CALENDARS,
+    CONF_COORDINATOR,
+    CONF_ENDPOINTS,
+    CONF_PASSWORD,
+    CONF_REQUEST_TIMEOUT,
+    CONF_USERNAME,
+    CONF_WASTAGE,
+    DOMAIN,
+)
+
+from . import NEXT_DELIVERY_ENTITY
+from .stub_server import PASSWORD, USERNAME, WASTAGE_PATH, TMMStubServer
+
+
+def _calendar_choices(result: dict[str, Any]) -> dict[str, str]:
+    """Return the calendars offered by a form."""
+    for key, validator in result["data_schema"].schema.items():
+        if key == CONF_CALENDARS:
+            return validator.options
+    raise AssertionError("Form has no calendar selector")
+
+
+def _add_calendar(hass: HomeAssistant, object_id: str, features: int) -> str:
+    """Register a calendar entity and give it a state."""
+    entry = er.async_get(hass).async_get_or_create(
+        "calendar",
+        "local_calendar",
+        object_id,
+        suggested_object_id=object_id,
+        original_name=object_id.title(),
+    )
+    hass.states.async_set(
+        entry.entity_id, "off", {ATTR_SUPPORTED_FEATURES: features}
+    )
+    return entry.entity_id
+
+
+async def test_user_flow(hass: HomeAssistant, stub: TMMStubServer) -> None:
+    """Check the user form offers writable calendars and creates an entry."""
+    home = _add_calendar(hass, "home", CalendarEntityFeature.CREATE_EVENT)
+    _add_calendar(hass, "holidays", 0)
+
+    result = await hass.config_entries.flow.async_init(
+        DOMAIN, context={"source": SOURCE_USER}
+    )
+    assert result["type"] is FlowResultType.FORM
+    assert result["step_id"] == "user"
+    assert _calendar_choices(result) == {
+        home: "Home",
+        "None": "Create a new calendar",
+    }
+
+    result = await hass.config_entries.flow.async_configure(
+        result["flow_id"],
+        {CONF_USERNAME: USERNAME, CONF_PASSWORD: PASSWORD, CONF_CALENDARS: [home]},
+    )
+    await hass.async_block_till_done()
+    assert result["type"] is FlowResultType.CREATE_ENTRY
+    assert result["title"] == "Ada Lovelace"
+
+    entry = result["result"]
+    assert await hass.config_entries.async_unload(entry.entry_id)
+
+
+async def test_user_flow_invalid_auth(
+    hass: HomeAssistant, stub: TMMStubServer
+) -> None:
+    """Check a rejected login is reported on the form."""
+    result = await hass.config_entries.flow.async_init(
+        DOMAIN, context={"source": SOURCE_USER}
+    )
+    result = await hass.config_entries.flow.async_configure(
+        result["flow_id"],
+        {CONF_USERNAME: USERNAME, CONF_PASSWORD: "skimmed", CONF_CALENDARS: []},
+    )
+
+    assert result["type"] is FlowResultType.FORM
+    assert result["errors"] == {"base": "invalid_auth"}
+
+
+async def test_calendar_choices_follow_changes(hass: HomeAssistant) -> None:
+    """Check the cached calendars are rebuilt when a calendar changes."""
+    result = await hass.config_entries.flow.async_init(
+        DOMAIN, context={"source": SOURCE_USER}
+    )
+    assert _calendar_choices(result) == {"None": "Create a new calendar"}
+
+    work = _add_calendar(hass, "work", CalendarEntityFeature.CREATE_EVENT)
+    await hass.async_block_till_done()
+
+    result = await hass.config_entries.flow.async_init(
+        DOMAIN, context={"source": SOURCE_USER}
+    )
+    assert work in _calendar_choices(result)
+
+
+async def test_options_form(
+    hass: HomeAssistant, stub: TMMStubServer, config_entry, caplog
+) -> None:
+    """Check the options form opens for a loaded entry."""
+    config_entry.add_to_hass(hass)
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    result = await hass.config_entries.options.async_init(config_entry.entry_id)
+    assert result["type"] is FlowResultType.FORM
+    assert result["step_id"] == "init"
+    assert "sets option flow config_entry explicitly" not in caplog.text
+
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+
+
+async def test_options_flow(
+    hass: HomeAssistant, stub: TMMStubServer, config_entry
+) -> None:
+    """Check saved options are applied to the running entry."""
+    config_entry.add_to_hass(hass)
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    coordinator = hass.data[DOMAIN][config_entry.entry_id][CONF_COORDINATOR]
+    assert hass.states.get(NEXT_DELIVERY_ENTITY).state == (
+        stub.config.delivery_date.isoformat()
+    )
+
+    result = await hass.config_entries.options.async_init(config_entry.entry_id)
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"], {CONF_ENDPOINTS: []}
+    )
+    assert result["type"] is FlowResultType.FORM
+    assert result["errors"] == {CONF_ENDPOINTS: "no_endpoints"}
+
+    # Dropping the next delivery endpoint leaves the sensor without a date.
+    stub.reset_counts()
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"],
+        {CONF_ENDPOINTS: [CONF_WASTAGE], CONF_REQUEST_TIMEOUT: 10},
+    )
+    await hass.async_block_till_done()
+    assert result["type"] is FlowResultType.CREATE_ENTRY
+    assert config_entry.state is ConfigEntryState.LOADED
+
+    assert coordinator.options.endpoints == (CONF_WASTAGE,)
+    assert coordinator.client.auth.timeout.total == 10
+    assert stub.requests == {WASTAGE_PATH: 1}
+    assert hass.states.get(NEXT_DELIVERY_ENTITY).state == STATE_UNKNOWN
+
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
@@ -0,0 +1,168 @@
+"""Tests for The Modern Milkman coordinator against the stub API."""
+
+from __future__ import annotations
+
+from datetime import timedelta
+
+from homeassistant.const import STATE_UNKNOWN
+from homeassistant.core import HomeAssistant
+
+from custom_components.themodernmilkman.breaker import STATE_CLOSED, STATE_OPEN
+from custom_components.themodernmilkman.const import (
+    BREAKER_THRESHOLD,
+    CONF_COORDINATOR,
+    CONF_NEXT_DELIVERY,
+    CONF_WASTAGE,
+    DOMAIN,
+)
+from custom_components.themodernmilkman.coordinator import TMMCoordinator
+from custom_components.themodernmilkman.exceptions import APIRatelimitExceeded
+
+from . import NEXT_DELIVERY_ENTITY
+from .stub_server import NEXT_DELIVERY_PATH, WASTAGE_PATH, TMMStubServer
+
+
+async def _async_setup(hass: HomeAssistant, config_entry) -> TMMCoordinator:
+    """Set the entry up and return its coordinator."""
+    config_entry.add_to_hass(hass)
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    return hass.data[DOMAIN][config_entry.entry_id][CONF_COORDINATOR]
+
+
+async def test_server_errors_open_the_circuit(
+    hass: HomeAssistant, stub: TMMStubServer, config_entry
+) -> None:
+    """Check an endpoint answering 5xx counts as an outage."""
+    coordinator = await _async_setup(hass, config_entry)
+    delivery_date = stub.config.delivery_date.isoformat()
+
+    stub.config.errors = {WASTAGE_PATH: 503, NEXT_DELIVERY_PATH: 503}
+    for _ in range(BREAKER_THRESHOLD):
+        await coordinator.async_refresh()
+
+    assert coordinator.breaker.state == STATE_OPEN
+    assert coordinator.stale
+    assert coordinator.last_update_success
+
+    # The open circuit keeps requests off the API and the last data in place.
+    stub.reset_counts()
+    await coordinator.async_refresh()
+    assert stub.total_requests == 0
+    assert hass.states.get(NEXT_DELIVERY_ENTITY).state == delivery_date
+
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+
+
+async def test_one_endpoint_failing(
+    hass: HomeAssistant, stub: TMMStubServer, config_entry
+) -> None:
+    """Check a 5xx from one endpoint keeps its data and counts as a failure."""
+    coordinator = await _async_setup(hass, config_entry)
+    delivery_date = stub.config.delivery_date.isoformat()
+
+    stub.config.errors = {NEXT_DELIVERY_PATH: 503}
+    await coordinator.async_refresh()
+
+    assert coordinator.breaker.failures == 1
+    assert not coordinator.stale
+    assert hass.states.get(NEXT_DELIVERY_ENTITY).state == delivery_date
+
+    stub.config.errors = {}
+    await coordinator.async_refresh()
+    assert coordinator.breaker.state == STATE_CLOSED
+    assert coordinator.breaker.failures == 0
+
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+
+
+async def test_no_delivery_scheduled(
+    hass: HomeAssistant, stub: TMMStubServer, config_entry
+) -> None:
+    """Check a 404 from the next delivery endpoint means no delivery."""
+    coordinator = await _async_setup(hass, config_entry)
+
+    stub.config.errors = {NEXT_DELIVERY_PATH: 404}
+    await coordinator.async_refresh()
+    await hass.async_block_till_done()
+
+    assert not coordinator.data.next_delivery.known
+    assert coordinator.breaker.failures == 0
+    assert hass.states.get(NEXT_DELIVERY_ENTITY).state == STATE_UNKNOWN
+
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+
+
+async def test_conditional_requests(
+    hass: HomeAssistant, stub: TMMStubServer, config_entry
+) -> None:
+    """Check unchanged endpoints are revalidated rather than downloaded."""
+    coordinator = await _async_setup(hass, config_entry)
+
+    stub.reset_counts()
+    await coordinator.async_refresh()
+    assert stub.not_modified == {WASTAGE_PATH: 1, NEXT_DELIVERY_PATH: 1}
+
+    # New validators for the same body are picked up from the full response.
+    stub.config.etag_version += 1
+    stub.reset_counts()
+    await coordinator.async_refresh()
+    assert not stub.not_modified
+    await coordinator.async_refresh()
+    assert stub.not_modified == {WASTAGE_PATH: 1, NEXT_DELIVERY_PATH: 1}
+
+    # A changed body is downloaded and parsed.
+    stub.config.bottles_saved += 1
+    stub.reset_counts()
+    await coordinator.async_refresh()
+    assert stub.not_modified == {NEXT_DELIVERY_PATH: 1}
+    assert coordinator.data.wastage.bottles_saved == stub.config.bottles_saved
+
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+
+
+async def test_rate_limited(
+    hass: HomeAssistant, stub: TMMStubServer, config_entry
+) -> None:
+    """Check a 429 holds back requests until its Retry-After has passed."""
+    coordinator = await _async_setup(hass, config_entry)
+
+    stub.config.errors = {WASTAGE_PATH: 429}
+    stub.config.retry_after = 600
+    await coordinator.async_refresh()
+
+    # The wastage from before is kept and the next refresh waits it out.
+    assert isinstance(coordinator.endpoint_errors[CONF_WASTAGE], APIRatelimitExceeded)
+    assert coordinator.data.wastage.bottles_saved == stub.config.bottles_saved
+    assert coordinator.update_interval >= timedelta(seconds=600)
+    assert coordinator.client.limiter.blocked_for > 590
+
+    # Until then nothing reaches the API and the previous data is served.
+    stub.reset_counts()
+    await coordinator.async_refresh()
+    assert stub.total_requests == 0
+    assert coordinator.endpoint_errors.keys() == {CONF_WASTAGE, CONF_NEXT_DELIVERY}
+    assert all(
+        isinstance(err, APIRatelimitExceeded)
+        for err in coordinator.endpoint_errors.values()
+    )
+    assert coordinator.data.next_delivery.delivery_date == stub.config.delivery_date
+
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+
+
+async def test_slow_api_times_out(
+    hass: HomeAssistant, stub: TMMStubServer, config_entry
+) -> None:
+    """Check requests slower than the timeout are treated as an outage."""
+    coordinator = await _async_setup(hass, config_entry)
+
+    coordinator.client.set_request_timeout(0.1)
+    stub.config.latency = {WASTAGE_PATH: 0.5, NEXT_DELIVERY_PATH: 0.5}
+    await coordinator.async_refresh()
+
+    assert coordinator.stale
+    assert coordinator.breaker.failures == 1
+    assert coordinator.last_update_success
+
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
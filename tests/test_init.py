@@ -0,0 +1,30 @@
+"""Tests for setting up and stopping The Modern Milkman."""
+
+from __future__ import annotations
+
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.const import EVENT_HOMEASSISTANT_CLOSE
+from homeassistant.core import HomeAssistant
+
+from custom_components.themodernmilkman.pool import async_get_pool
+
+from .stub_server import TMMStubServer
+
+
+async def test_session_closed_on_stop(
+    hass: HomeAssistant, stub: TMMStubServer, config_entry
+) -> None:
+    """Check the shared HTTP session is closed when Home Assistant stops."""
+    config_entry.add_to_hass(hass)
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    assert config_entry.state is ConfigEntryState.LOADED
+
+    session = async_get_pool(hass).session
+    assert not session.closed
+
+    # Entries stay loaded at shutdown, only the close event runs.
+    hass.bus.async_fire(EVENT_HOMEASSISTANT_CLOSE)
+    await hass.async_block_till_done()
+
+    assert session.closed
@@ -0,0 +1,33 @@
+"""Tests for The Modern Milkman latency metrics."""
+
+from __future__ import annotations
+
+import pytest
+
+from custom_components.themodernmilkman.const import (
+    CONF_WASTAGE,
+    METRIC_LOGIN,
+    METRIC_REFRESH,
+)
+from custom_components.themodernmilkman.metrics import TMMMetrics
+
+
+async def test_listeners_follow_one_metric() -> None:
+    """Check a listener only hears about the operation it follows."""
+    metrics = TMMMetrics()
+    calls: list[str] = []
+    remove = metrics.async_add_listener(METRIC_LOGIN, lambda: calls.append("login"))
+
+    with metrics.measure(CONF_WASTAGE), metrics.measure(METRIC_REFRESH):
+        pass
+    assert calls == []
+
+    with pytest.raises(ValueError), metrics.measure(METRIC_LOGIN):
+        raise ValueError("Bad login")
+    assert calls == ["login"]
+    assert metrics.get(METRIC_LOGIN).errors == 1
+
+    remove()
+    with metrics.measure(METRIC_LOGIN):
+        pass
+    assert calls == ["login"]
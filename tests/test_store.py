@@ -0,0 +1,44 @@
+"""Tests for The Modern Milkman persistent storage."""
+
+from __future__ import annotations
+
+from datetime import date
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.themodernmilkman.store import TMMDeliveryHistory
+
+TODAY = date(2026, 3, 2)
+
+
+async def test_delivery_history(hass: HomeAssistant, hass_storage) -> None:
+    """Check the history keeps sorted dates and drops superseded ones."""
+    history = TMMDeliveryHistory(hass, "history")
+    history.record(date(2026, 3, 1), date(2026, 2, 28))
+    history.record(date(2026, 3, 4), TODAY)
+    history.record(date(2026, 3, 4), TODAY)
+    assert len(history) == 2
+
+    # The delivery on the 4th moved to the 6th, so it never happens.
+    history.record(date(2026, 3, 6), TODAY)
+    assert history.between(date(2026, 3, 1), date(2026, 3, 6)) == [
+        date(2026, 3, 1)
+    ]
+    assert history.between(date(2026, 3, 1), date(2026, 3, 7)) == [
+        date(2026, 3, 1),
+        date(2026, 3, 6),
+    ]
+
+    # Only the dates are written out.
+    assert history._data_to_save() == ["2026-03-01", "2026-03-06"]
+    hass_storage["themodernmilkman.history.history"] = {
+        "version": 1,
+        "data": history._data_to_save(),
+    }
+
+    restored = TMMDeliveryHistory(hass, "history")
+    await restored.async_load()
+    assert restored.between(date.min, date.max) == [
+        date(2026, 3, 1),
+        date(2026, 3, 6),
+    ]